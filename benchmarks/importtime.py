@@ -0,0 +1,70 @@
+import argparse
+import os
+import subprocess
+import sys
+
+# Import time of the package, measured with python -X importtime.
+#
+#   python benchmarks/importtime.py [--runs N] [--budget MS] [MODULE ...]
+#
+# Every module is imported in a fresh interpreter, N times, and the median
+# cumulative import time is reported, together with the modules it pulls in
+# that a bare interpreter doesn't already load. With --budget the script
+# exits with status 1 when a core module takes longer than that.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tis100 import CORE, OPTIONAL
+
+MODULES = ['tis100'] + ['tis100.' + name for name in CORE + OPTIONAL]
+
+
+def importtime(statement):
+    # {module: (self, cumulative)} in microseconds, as printed by -X importtime
+    env = dict(os.environ)
+    # compiling the sources would be measured too, so allow .pyc files
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT, env=env,
+                          stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    res = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        res[name.strip()] = (int(own), int(cumulative))
+    return res
+
+
+def measure(module, runs):
+    times = sorted(importtime('import ' + module)[module][1] for _ in range(runs))
+    return times[len(times) // 2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='measure import time of the tis100 package')
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--runs', type=int, default=9)
+    parser.add_argument('--budget', type=float, help='most milliseconds a core module may take')
+    args = parser.parse_args(argv)
+
+    # warm up, so .pyc files exist
+    importtime('import ' + ', '.join(args.modules))
+    baseline = set(importtime('pass'))
+    over = []
+    for module in args.modules:
+        ms = measure(module, args.runs) / 1000.0
+        extra = sorted(name for name in importtime('import ' + module)
+                       if name not in baseline and not name.startswith('tis100'))
+        print('{:<20} {:7.2f} ms  {}'.format(module, ms, ', '.join(extra)))
+        core = module == 'tis100' or module[len('tis100.'):] in CORE
+        if args.budget is not None and core and ms > args.budget:
+            over.append(module)
+    if over:
+        print('over the budget of {} ms: {}'.format(args.budget, ', '.join(over)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
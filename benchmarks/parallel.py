@@ -0,0 +1,86 @@
+import argparse
+import os
+import sys
+import time
+
+# How stepping scales with threads.
+#
+#   python benchmarks/parallel.py [--width W] [--height H] [--cycles N] [--workers 1 2 4 8]
+#
+# Steps one large board (every column is a pipeline adding 1 to the values
+# flowing down it) with a plain Engine, then with a PartitionedEngine for
+# every number of workers, and checks that they all end in the same state.
+# Then evaluates many boards of a puzzle at once with evaluate_all().
+# Threads only run at the same time on a free-threaded build of Python.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tis100.assembly import UP, DOWN
+from tis100.engine import Engine
+from tis100.genetic import GeneticAlgorithm
+from tis100.parallel import PartitionedEngine, evaluate_all
+from tis100.puzzle import get_puzzle
+from tis100.topology import Topology
+
+
+def board(width, height, length):
+    programs = ['mov up, acc\nadd 1\nmov acc, down'] * (width * height)
+    inputs = dict(((col, UP), list(range(length))) for col in range(width))
+    outputs = [((height - 1) * width + col, DOWN) for col in range(width)]
+    return Engine(programs, Topology(width, height), inputs, outputs)
+
+
+def timed(step, cycles):
+    start = time.perf_counter()
+    for _ in range(cycles):
+        step()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='measure multi-threaded stepping')
+    parser.add_argument('--width', type=int, default=16)
+    parser.add_argument('--height', type=int, default=16)
+    parser.add_argument('--cycles', type=int, default=200)
+    parser.add_argument('--boards', type=int, default=200, help='boards for evaluate_all')
+    parser.add_argument('--workers', type=int, nargs='*', default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('python {}, GIL {}, {} cpus'.format(sys.version.split()[0], 'enabled' if gil else 'disabled',
+                                              os.cpu_count()))
+    nodes = args.width * args.height
+    print('one {}x{} board, {} cycles'.format(args.width, args.height, args.cycles))
+    engine = board(args.width, args.height, args.cycles)
+    serial = timed(engine.step, args.cycles)
+    expected = engine.snapshot()
+    print('  serial     {:8.0f} node cycles/s'.format(nodes * args.cycles / serial))
+    for workers in args.workers:
+        engine = board(args.width, args.height, args.cycles)
+        with PartitionedEngine(engine, workers) as parallel:
+            elapsed = timed(parallel.step, args.cycles)
+        if engine.snapshot() != expected:
+            raise Exception('{} workers ended in a different state'.format(workers))
+        print('  {:2} workers {:8.0f} node cycles/s  {:.2f}x'.format(
+            workers, nodes * args.cycles / elapsed, serial / elapsed))
+
+    puzzle = get_puzzle('10981')
+    test_set = puzzle.test_set()
+    boards = GeneticAlgorithm(puzzle, population=args.boards).population
+    print('{} boards of {}'.format(len(boards), puzzle.name))
+    start = time.perf_counter()
+    expected = [str(puzzle.evaluate(programs, test_set, 500)) for programs in boards]
+    serial = time.perf_counter() - start
+    print('  serial     {:8.0f} boards/s'.format(len(boards) / serial))
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = evaluate_all(puzzle, boards, test_set, workers, max_cycles=500)
+        elapsed = time.perf_counter() - start
+        if [str(result) for result in results] != expected:
+            raise Exception('{} workers gave different results'.format(workers))
+        print('  {:2} workers {:8.0f} boards/s  {:.2f}x'.format(workers, len(boards) / elapsed, serial / elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import unittest
+from tis100.analysis import analyze, reachable, shortest_loop, successors, \
+    NOWHERE, UNMATCHED, NO_WRITER, NO_INPUT, ONCE
+from tis100.assembly import DOWN
+from tis100.engine import decode
+from tis100.genetic import GeneticAlgorithm
+from tis100.puzzle import Puzzle, get_puzzle
+from test_puzzle import AMPLIFIER
+
+
+class AnalysisTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+
+    def board(self, **programs):
+        # AMPLIFIER with some nodes replaced, by node number like n10='...'
+        res = AMPLIFIER[:]
+        for name, program in programs.items():
+            res[int(name[1:])] = program
+        return res
+
+    def kinds(self, programs):
+        return sorted((issue.kind, issue.node) for issue in analyze(self.puzzle, programs).issues)
+
+    def testControlFlow(self):
+        program = decode('a: add 1\njgz a\njro 9\nb: jmp b\nsav')
+        self.assertEqual([0, 2], successors(program, 1))
+        self.assertEqual([4], successors(program, 2))
+        self.assertEqual([0, 1, 2, 4], reachable(program))
+        self.assertEqual([0, 1, 2], successors(decode('jro acc\nnop\nnop'), 0))
+        # read 2, add 1, write 2
+        program = decode('mov up, acc\nadd 1\nmov acc, down')
+        self.assertEqual(5, shortest_loop(program, 2))
+        self.assertEqual(3, shortest_loop(decode('mov up, down'), 0))
+        self.assertIsNone(shortest_loop(decode('mov up, down\na: jmp a'), 0))
+
+    def testSolution(self):
+        analysis = analyze(self.puzzle, AMPLIFIER)
+        self.assertEqual([], analysis.issues)
+        self.assertFalse(analysis.impossible())
+        self.assertEqual({(10, DOWN): 5}, analysis.cycles_per_output)
+        self.assertEqual(set([10]), analysis.graph[6])
+        # the estimate is never more than it really takes
+        result = self.puzzle.evaluate(AMPLIFIER, self.puzzle.test_set())
+        self.assertTrue(5 * result.expected <= result.cycles)
+
+    def testNoWriter(self):
+        programs = self.board(n10='')
+        self.assertEqual([(NO_WRITER, 10), (UNMATCHED, 6)], self.kinds(programs))
+        self.assertTrue(analyze(self.puzzle, programs).impossible())
+
+    def testNowhere(self):
+        # node 3 is on the right edge, node 0 has no input
+        programs = self.board(n3='mov 1, right', n0='mov up, acc')
+        self.assertEqual([(NOWHERE, 0), (NOWHERE, 3)], self.kinds(programs))
+        self.assertFalse(analyze(self.puzzle, programs).impossible())
+
+    def testUnreachableIsIgnored(self):
+        programs = self.board(n10='jmp a\nmov 1, left\na: mov up, down')
+        self.assertEqual([], self.kinds(programs))
+
+    def testNoInput(self):
+        programs = self.board(n10='mov 2, down')
+        self.assertEqual([(NO_INPUT, 10), (UNMATCHED, 6)], self.kinds(programs))
+
+    def testOnce(self):
+        programs = self.board(n10='mov up, down\na: jmp a')
+        self.assertEqual([(ONCE, 10)], self.kinds(programs))
+        self.assertIn('at most once, but 39 values are expected', analyze(self.puzzle, programs).report())
+        # two writes that aren't on a loop are still too few for 39 values
+        programs = self.board(n10='mov up, down\nmov up, down\na: jmp a')
+        self.assertIn('at most 2 times', analyze(self.puzzle, programs).report())
+        # but enough when the puzzle only expects 2
+        puzzle = self.puzzle
+        short = Puzzle(puzzle.id, puzzle.name, puzzle.inputs, puzzle.outputs, puzzle.generate, length=2)
+        self.assertEqual([], analyze(short, programs).issues)
+
+    def testPrune(self):
+        ga = GeneticAlgorithm(self.puzzle, population=10, prune=True)
+        ga.population = [tuple(decode(p) for p in self.board(n10='')), tuple(decode(p) for p in AMPLIFIER)]
+        scored = ga.scored()
+        self.assertEqual(1, ga.rejected)
+        self.assertTrue(scored[0][0][0])
+        self.assertEqual((False, 0.0, 0, 0, 0, 0), scored[1][0])
+
+
+if __name__ == '__main__':
+    unittest.main()
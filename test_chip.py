@@ -1,5 +1,5 @@
 import unittest
-from assembly import AssemblyChip, READ, WRITE, RUN, global_inc
+from tis100.assembly import AssemblyChip, Channel, READ, WRITE, RUN, global_inc, run_cycle
 
 '''
 TODO:
@@ -142,13 +142,15 @@ class SimpleTestCase(unittest.TestCase):
         self.assertTrue(chip2.state == READ, '\n'+str(chip2))
         self.assertTrue(chip2.pc == 0)
 
-        global_inc()
+        global_inc([chip1, chip2])
 
         debug('\n' + str(chip1))
         debug('\n' + str(chip2))
 
         chip1.run()
         chip2.run()
+        # the transfer happens when the cycle is committed
+        global_inc([chip1, chip2])
 
         debug('\n' + str(chip1))
         debug('\n' + str(chip2))
@@ -181,7 +183,7 @@ class SimpleTestCase(unittest.TestCase):
 
         chip1.run()
         chip2.run()
-        global_inc()
+        global_inc([chip1, chip2])
 
         # both should be in read/write state after 1 cycle
         self.assertTrue(chip1.state == WRITE, str(chip1))
@@ -195,7 +197,7 @@ class SimpleTestCase(unittest.TestCase):
 
         chip1.run()
         chip2.run()
-        global_inc()
+        global_inc([chip1, chip2])
 
         # after 2 cycles, chip1/chip2 should complete their reads and writes
         debug('CYCLE: after 2, before 3')
@@ -210,7 +212,7 @@ class SimpleTestCase(unittest.TestCase):
 
         chip1.run()
         chip2.run()
-        global_inc()
+        global_inc([chip1, chip2])
 
         debug('CYCLE: after 3, before 4')
         debug(str(chip1))
@@ -224,7 +226,7 @@ class SimpleTestCase(unittest.TestCase):
 
         chip1.run()
         chip2.run()
-        global_inc()
+        global_inc([chip1, chip2])
 
         # now receive a read and finish a write
         debug('CYCLE: after 4, before 5')
@@ -486,6 +488,77 @@ class SimpleTestCase(unittest.TestCase):
         self.assertTrue(chip1.cycle == 3)
 
 
+class ChannelTestCase(unittest.TestCase):
+    def chain(self, programs):
+        # chips connected left to right
+        chips = [AssemblyChip(parse(program)) for program in programs]
+        for left, right in zip(chips, chips[1:]):
+            left.right = right
+        return chips
+
+    def trace(self, chips, order, cycles):
+        res = []
+        for _ in range(cycles):
+            run_cycle([chips[i] for i in order])
+            res.append([(chip.state, chip.pc, chip.acc) for chip in chips])
+        return res
+
+    def testConnectBothWays(self):
+        chip1, chip2 = self.chain(['nop', 'nop'])
+        self.assertIs(chip2, chip1.right)
+        self.assertIs(chip1, chip2.left)
+        self.assertIs(chip1.outgoing['right'], chip2.incoming['left'])
+        self.assertIsNone(chip1.left)
+
+    def testOrderDoesNotMatter(self):
+        programs = ['add 1\nmov acc, right', 'mov left, right', 'add left\nneg']
+        forward = self.trace(self.chain(programs), [0, 1, 2], 30)
+        backward = self.trace(self.chain(programs), [2, 1, 0], 30)
+        self.assertEqual(forward, backward)
+        # values made it through the cascade in the middle
+        self.assertTrue(any(states[2][2] != 0 for states in forward))
+
+    def testWriteBeforeRead(self):
+        # the write waits for a read that comes much later
+        chip1, chip2 = self.chain(['mov 12, right', 'nop\nnop\nnop\nadd left'])
+        for _ in range(4):
+            run_cycle([chip1, chip2])
+        self.assertEqual(WRITE, chip1.state)
+        self.assertEqual(READ, chip2.state)
+        run_cycle([chip1, chip2])
+        self.assertEqual(12, chip2.acc)
+        self.assertEqual(RUN, chip1.state)
+
+    def testBlockedChannelsAreNotCommitted(self):
+        # a write nobody reads stays out of the way of later cycles
+        chip1, chip2 = self.chain(['mov 1, right', 'nop'])
+        for _ in range(3):
+            run_cycle([chip1, chip2])
+        self.assertEqual(WRITE, chip1.state)
+        self.assertNotIn(chip1.outgoing['right'], Channel.active([chip1, chip2]))
+
+    def testBoardsAreIndependent(self):
+        # two boards stepped in turns end up where each would on its own
+        programs = ['mov 5, right', 'mov left, acc']
+        alone = self.trace(self.chain(programs), [0, 1], 6)
+        a = self.chain(programs)
+        b = self.chain(programs)
+        both = []
+        for _ in range(6):
+            run_cycle(a)
+            run_cycle(b)
+            both.append([(chip.state, chip.pc, chip.acc) for chip in a])
+        self.assertEqual(alone, both)
+        self.assertEqual(5, a[1].acc)
+
+    def testUnconnectedPortBlocks(self):
+        chip, = self.chain(['mov 1, left\nadd 1'])
+        for _ in range(5):
+            run_cycle([chip])
+        self.assertEqual(WRITE, chip.state)
+        self.assertEqual(0, chip.acc)
+
+
 def run_all():
     unittest.main()
 
@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import unittest
+from tis100.assembly import RUN
+from tis100.cli import Stepper, interactive, main, BREAKPOINT, CYCLES, OUTPUT, STUCK, WATCHPOINT, WRITTEN, START
+from tis100.puzzle import get_puzzle, parse_solution, format_solution
+from test_puzzle import AMPLIFIER
+
+
+class CliTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def stepper(self):
+        return Stepper(self.puzzle, AMPLIFIER, self.puzzle.test_set())
+
+    def testSolutionFormat(self):
+        self.assertEqual(AMPLIFIER, parse_solution(format_solution(AMPLIFIER)))
+        self.assertEqual(['', 'mov up, down'], parse_solution('@1\nmov up, down\n\n'))
+
+    def testRunCycles(self):
+        stepper = self.stepper()
+        self.assertEqual(CYCLES, stepper.run(10))
+        self.assertEqual(10, stepper.engine.cycle)
+
+    def testBreakpoint(self):
+        stepper = self.stepper()
+        # line 3 of node 5 is mov acc, right
+        self.assertTrue(stepper.toggle_breakpoint(5, 3))
+        self.assertEqual(BREAKPOINT, stepper.run_until_breakpoint())
+        self.assertEqual(RUN, stepper.engine.mode[5])
+        self.assertEqual(2, stepper.engine.pc[5])
+        cycle = stepper.engine.cycle
+        stepper.run(1)
+        self.assertEqual(BREAKPOINT, stepper.run_until_breakpoint())
+        self.assertTrue(stepper.engine.cycle > cycle + 1)
+        self.assertFalse(stepper.toggle_breakpoint(5, 3))
+
+    def testRunUntilOutput(self):
+        stepper = self.stepper()
+        self.assertEqual(OUTPUT, stepper.run_until_output(5))
+        self.assertEqual(5, stepper.engine.output_count())
+        self.assertEqual(STUCK, stepper.run_until_output(100))
+
+    def testInteractive(self):
+        commands = iter(['b 5:3', 'c', 's 3', '', 'o 2', 'p 5', 'bogus', 'q'])
+        out = []
+        interactive(self.stepper(), lambda prompt: next(commands), out.append)
+        text = '\n'.join(out)
+        self.assertIn('breakpoint added node 5 line 3', text)
+        self.assertIn('stopped: breakpoint', text)
+        self.assertIn('stopped: output', text)
+        self.assertIn('unknown command bogus', text)
+
+    def testBack(self):
+        stepper = self.stepper()
+        stepper.run(20)
+        snapshot = stepper.engine.snapshot()
+        stepper.run(5)
+        self.assertEqual(CYCLES, stepper.back(5))
+        self.assertEqual(snapshot, stepper.engine.snapshot())
+        self.assertEqual(START, stepper.back(100))
+        self.assertEqual(0, stepper.engine.cycle)
+
+    def testWatchpoint(self):
+        stepper = self.stepper()
+        self.assertTrue(stepper.toggle_watchpoint(5, '>=', 10))
+        self.assertEqual(WATCHPOINT, stepper.run_until_breakpoint())
+        self.assertTrue(stepper.engine.acc[5] >= 10)
+        cycle = stepper.engine.cycle
+        stepper.run(20)
+        self.assertEqual(WATCHPOINT, stepper.reverse_continue())
+        self.assertEqual(cycle - 1, stepper.engine.cycle)
+        self.assertFalse(stepper.toggle_watchpoint(5, '>=', 10))
+
+    def testBackToWrite(self):
+        stepper = self.stepper()
+        stepper.run_until_output(3)
+        self.assertEqual(WRITTEN, stepper.back_to_write(10, 'down'))
+        self.assertEqual(2, stepper.engine.output_count())
+
+    def testNoHistory(self):
+        stepper = Stepper(self.puzzle, AMPLIFIER, self.puzzle.test_set(), history=None)
+        self.assertIsNone(stepper.history)
+        self.assertEqual(OUTPUT, stepper.run_until_output(3))
+        # same board as with a history
+        other = self.stepper()
+        other.run_until_output(3)
+        self.assertEqual(other.engine.snapshot(), stepper.engine.snapshot())
+        self.assertTrue(stepper.toggle_watchpoint(5))
+        self.assertEqual(WATCHPOINT, stepper.run_until_breakpoint())
+        self.assertRaises(Exception, stepper.back)
+        self.assertRaises(Exception, stepper.back_to_write, 10, 'down')
+        out = []
+        commands = iter(['r', 'q'])
+        interactive(stepper, lambda prompt: next(commands), out.append)
+        self.assertIn('no history to step back through', out)
+
+    def testInteractiveBack(self):
+        commands = iter(['s 30', 'w 5', 'c', 'r 2', 'rw 10 down', 'rc', 'r 1000', 'q'])
+        out = []
+        interactive(self.stepper(), lambda prompt: next(commands), out.append)
+        text = '\n'.join(out)
+        self.assertIn('watchpoint added acc of node 5 changes', text)
+        self.assertIn('stopped: watchpoint', text)
+        self.assertIn('stopped: write', text)
+        self.assertIn('stopped: start of history', text)
+
+    def testMain(self):
+        path = os.path.join(self.dir, '10981.0.txt')
+        with open(path, 'w') as f:
+            f.write(format_solution(AMPLIFIER))
+        self.assertEqual(0, main(['run', path, '--tests', '1']))
+        broken = AMPLIFIER[:]
+        broken[10] = ''
+        with open(path, 'w') as f:
+            f.write(format_solution(broken))
+        self.assertEqual(1, main(['run', path, '--tests', '1']))
+        self.assertEqual(1, main(['run', path, '--tests', '2', '--keep-going']))
+        with self.assertRaises(SystemExit):
+            main(['run', path, '--tests', '0'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+from tis100.assembly import AssemblyChip, run_cycle, RUN, READ, WRITE, MOV, ADD, JMP, JRO, ACC, UP, DOWN, LEFT, RIGHT
+from tis100.engine import Engine, decode, encode, source_lines
+
+
+def parse(program):
+    # remove extra whitespaces
+    return '\n'.join([line.strip() for line in program.strip().split('\n')])
+
+
+class DecodeTestCase(unittest.TestCase):
+    def testDecode(self):
+        program = decode(parse('''
+        start:
+        MOV UP, ACC  # comment
+        add 1
+        loop: jgz start
+        jmp loop
+        '''))
+        self.assertEqual(((MOV, UP, ACC), (ADD, 1, None), ('jgz', 0, None), (JMP, 2, None)), program)
+
+    def testDecodeClampsConstants(self):
+        self.assertEqual(((ADD, 999, None), (MOV, -999, LEFT)), decode('add 5000\nmov -1000, left'))
+
+    def testLabelAtEndWraps(self):
+        self.assertEqual(((ADD, 1, None), (JMP, 0, None)), decode('add 1\njmp end\nend:'))
+
+    def testSourceLines(self):
+        self.assertEqual([1, 3], source_lines('a:\nadd 1\n\nb: sub 1'))
+
+    def testEncodeRoundTrip(self):
+        program = decode('a: mov up, acc\njez a\nmov acc, down\njro -2')
+        self.assertEqual(program, decode(encode(program)))
+
+    def testErrors(self):
+        for program in ['foo 1', 'jmp nowhere', 'mov 1', 'add x', 'mov 1, 2', '\n'.join(['nop'] * 16)]:
+            with self.assertRaises(Exception):
+                decode(program)
+
+
+class EngineTestCase(unittest.TestCase):
+    def testSameAsAssemblyChip(self):
+        # programs without ports run exactly as they do on an AssemblyChip
+        program = parse('''
+        add 600
+        sav
+        add 600
+        jgz skip
+        neg
+        skip: swp
+        sub 5
+        jro 2
+        add 100
+        jnz skip
+        ''')
+        chip = AssemblyChip(program)
+        engine = Engine([program])
+        lines = source_lines(program)
+        for _ in range(30):
+            chip.run()
+            engine.step()
+            self.assertEqual((chip.acc, chip.bak, chip.pc), (engine.acc[0], engine.bak[0], lines[engine.pc[0]]))
+
+    def testSameAsAssemblyChipWithPorts(self):
+        # both do the port handshake in two phases, so they agree every cycle
+        programs = ['add 1\nmov acc, right\nsav', 'mov left, right\nnop', 'add left\nneg']
+        chips = [AssemblyChip(program) for program in programs]
+        chips[0].right = chips[1]
+        chips[1].right = chips[2]
+        engine = Engine(programs, [{RIGHT: 1}, {LEFT: 0, RIGHT: 2}, {LEFT: 1}])
+        for _ in range(40):
+            run_cycle(chips)
+            engine.step()
+            self.assertEqual([(chip.state, chip.pc, chip.acc) for chip in chips],
+                             list(zip(engine.mode, engine.pc, engine.acc)))
+
+    def testTransfer(self):
+        # chip 0 writes right, chip 1 reads left: both take 2 cycles
+        engine = Engine(['mov 12, right\nnop', 'mov left, acc\nnop'], [{RIGHT: 1}, {LEFT: 0}])
+        engine.step()
+        self.assertEqual([WRITE, READ], engine.mode)
+        engine.step()
+        self.assertEqual([RUN, RUN], engine.mode)
+        self.assertEqual([1, 1], engine.pc)
+        self.assertEqual(12, engine.acc[1])
+
+    def testWriteBeforeRead(self):
+        engine = Engine(['mov 12, right', 'nop\nnop\nnop\nadd left'], [{RIGHT: 1}, {LEFT: 0}])
+        engine.run(4)
+        self.assertEqual(WRITE, engine.mode[0])
+        self.assertEqual(READ, engine.mode[1])
+        engine.step()
+        self.assertEqual(12, engine.acc[1])
+        self.assertEqual(RUN, engine.mode[0])
+
+    def testNodeOrderDoesNotMatter(self):
+        programs = ['mov up, acc\nadd 1\nmov acc, right', 'mov left, right', 'add left\nmov acc, down']
+        forward = Engine(programs, [{RIGHT: 1}, {LEFT: 0, RIGHT: 2}, {LEFT: 1}],
+                         inputs={(0, UP): [1, 2, 3]}, outputs=[(2, DOWN)])
+        backward = Engine(programs[::-1], [{LEFT: 1}, {LEFT: 2, RIGHT: 0}, {RIGHT: 1}],
+                          inputs={(2, UP): [1, 2, 3]}, outputs=[(0, DOWN)])
+        forward.run(20)
+        backward.run(20)
+        self.assertEqual([2, 5, 9], forward.outputs[(2, DOWN)])
+        self.assertEqual(forward.outputs[(2, DOWN)], backward.outputs[(0, DOWN)])
+        self.assertEqual(forward.acc, backward.acc[::-1])
+
+    def testSnapshot(self):
+        engine = Engine(['mov up, acc\nadd acc\nmov acc, down'], inputs={(0, UP): [1, 2, 3, 4]}, outputs=[(0, DOWN)])
+        engine.run(5)
+        snapshot = engine.snapshot()
+        engine.run(10)
+        after = (engine.acc[:], engine.outputs[(0, DOWN)][:])
+        engine.restore(snapshot)
+        self.assertEqual(5, engine.cycle)
+        engine.run(10)
+        self.assertEqual(after, (engine.acc, engine.outputs[(0, DOWN)]))
+
+    def testJroClamps(self):
+        engine = Engine([((JRO, 5, None), (ADD, 1, None), (JRO, ACC, None))])
+        engine.step()
+        self.assertEqual(2, engine.pc[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
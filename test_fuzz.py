@@ -0,0 +1,105 @@
+import io
+import random
+import unittest
+from contextlib import redirect_stdout
+from tis100 import logger
+from tis100.engine import decode
+from tis100.fuzz import Board, Fast, Reference, compare, fuzz, random_board, shrink
+
+
+class Saturating(Fast):
+    # an engine with a saturation bug: ACC stops at 998
+    name = 'saturating'
+
+    def step(self):
+        Fast.step(self)
+        self.engine.acc = [min(acc, 998) for acc in self.engine.acc]
+
+
+class Dropping(Fast):
+    # an engine with an output bug: the second value written to an output is lost
+    name = 'dropping'
+
+    def step(self):
+        Fast.step(self)
+        for values in self.engine.outputs.values():
+            if len(values) == 2:
+                values.pop()
+
+
+class FuzzTestCase(unittest.TestCase):
+    def testRandomBoardsAreValid(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            board = random_board(rng)
+            self.assertEqual(board.width * board.height, len(board.programs))
+            # inputs and outputs are on the edge
+            board.topology()
+            for program in board.programs:
+                decode(program)
+
+    def testEnginesAgree(self):
+        found = fuzz(60, 60, seed=2)
+        self.assertEqual([], [str(divergence) for divergence in found])
+
+    def testCorners(self):
+        for board in [
+            # labels on their own line, on an instruction line and at the end
+            Board(1, 1, ['start:\n  a: ADD 999\nadd 1\n# comment\njgz end\nsub 5\nend:']),
+            # jro past both ends, and by acc and nil
+            Board(1, 1, ['add 1\njro -5\nsav\njro 9\nnop']),
+            Board(1, 1, ['mov 2, acc\njro acc\nneg\nswp\njro nil']),
+            # saturation both ways, and constants out of range
+            Board(1, 1, ['sub 999\nsub 999\nmov -5000, acc\nadd 5000\nneg']),
+            # values cascading through the middle of a row
+            Board(3, 1, ['add 1\nmov acc right', 'mov left, right', 'add left\nsub nil\nmov acc, acc']),
+            # a write that waits for a late read, and a read from nowhere
+            Board(2, 1, ['mov 7, right\nmov up, acc', 'nop\nnop\nnop\nmov left, nil\nadd 1']),
+        ]:
+            self.assertIsNone(compare(board, 40), str(board))
+
+    def testInputsAndOutputs(self):
+        # values from the input on the left go through both nodes to the outputs
+        board = Board(2, 1, ['mov left, acc\nmov acc, right\nmov acc, up', 'mov left, down'],
+                      {(0, 'left'): [3, -999, 999]}, [(1, 'down'), (0, 'up')])
+        self.assertIsNone(compare(board, 40))
+        reference = Reference(board)
+        for _ in range(40):
+            reference.step()
+        self.assertEqual([(3, -999, 999), (3, -999, 999)], reference.states()[2:])
+        divergence = compare(board, 40, [Dropping])
+        self.assertIn('output 1 down: reference (3, -999), dropping (3,)', str(divergence))
+        self.assertIn('input 0 left: 3 -999 999', str(divergence))
+
+    def testComparesPorts(self):
+        # a write to a port nobody reads blocks on that port
+        board = Board(2, 1, ['mov 1, up', 'mov 2, down'])
+        self.assertIsNone(compare(board, 10))
+        for engine in (Reference(board), Fast(board)):
+            engine.step()
+            self.assertEqual([('wrte', 0, 0, 0, 'up', 1), ('wrte', 0, 0, 0, 'down', 2)], engine.states())
+
+    def testQuiet(self):
+        # AssemblyChip's debug lines stay out of the output, and the level is put back
+        out = io.StringIO()
+        with redirect_stdout(out):
+            self.assertIsNone(compare(Board(2, 1, ['mov 1, right', 'mov left, acc']), 10))
+        self.assertEqual('', out.getvalue())
+        self.assertEqual(logger.DEBUG, logger.LEVEL)
+
+    def testFindsAndShrinks(self):
+        found = fuzz(30, 60, seed=3, engines=[Saturating])
+        self.assertTrue(found)
+        divergence = found[0]
+        self.assertEqual('saturating', divergence.engine)
+        # still a reproducer, and down to a single short program
+        self.assertIsNotNone(compare(divergence.board, divergence.cycle, [Saturating]))
+        programs = [program for program in divergence.board.programs if program]
+        self.assertEqual(1, len(programs))
+        self.assertTrue(len(programs[0].splitlines()) <= 3, str(divergence))
+        self.assertIn('disagrees with the reference', str(divergence))
+        self.assertIs(divergence, shrink(divergence, [Saturating]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from tis100.engine import decode, encode, JUMPS, MAX_INSTRUCTIONS
+from tis100.genetic import GeneticAlgorithm, default_fitness, mutate_node, program_crossover, uniform_crossover
+from tis100.puzzle import get_puzzle, Result
+from test_puzzle import AMPLIFIER
+
+
+def check_candidate(test, candidate):
+    for program in candidate:
+        test.assertTrue(len(program) <= MAX_INSTRUCTIONS)
+        for op, a, b in program:
+            if op in JUMPS:
+                test.assertTrue(0 <= a < len(program))
+        test.assertEqual(program, decode(encode(program)))
+
+
+class GeneticTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testFitnessOrder(self):
+        fast = Result(True, 39, 39, 100, 4, 6)
+        slow = Result(True, 39, 39, 200, 3, 4)
+        small = Result(True, 39, 39, 100, 3, 6)
+        wrong = Result(False, 20, 39, 100, 1, 1)
+        worse = Result(False, 10, 39, 100, 1, 1)
+        ranked = sorted([wrong, slow, worse, small, fast], key=lambda r: default_fitness([r]), reverse=True)
+        self.assertEqual([small, fast, slow, wrong, worse], ranked)
+
+    def testOperatorsKeepGrammar(self):
+        ga = GeneticAlgorithm(self.puzzle, population=4)
+        rng = random.Random(5)
+        a = tuple(decode(p) for p in AMPLIFIER)
+        b = ga.random_candidate()
+        for _ in range(300):
+            a = mutate_node(a, rng, ga.grammars)
+            check_candidate(self, a)
+            check_candidate(self, program_crossover(a, b, rng))
+            check_candidate(self, uniform_crossover(a, b, rng))
+
+    def testElitismKeepsSolution(self):
+        ga = GeneticAlgorithm(self.puzzle, population=10, test_sets=1)
+        solution = tuple(decode(p) for p in AMPLIFIER)
+        ga.population[0] = solution
+        ga.run(3, report=0)
+        fitness, best = ga.best()
+        self.assertTrue(fitness[0])
+        self.assertTrue(ga.generations_per_second() > 0)
+
+    def testResumeFromCheckpoint(self):
+        path = os.path.join(self.dir, 'population.json')
+        straight = GeneticAlgorithm(self.puzzle, population=8, test_sets=1, seed=2)
+        straight.run(4, report=0)
+        first = GeneticAlgorithm(self.puzzle, population=8, test_sets=1, seed=2)
+        first.run(2, checkpoint=path, report=0)
+        resumed = GeneticAlgorithm.resume(self.puzzle, path, population=8, test_sets=1, seed=99)
+        self.assertEqual(2, resumed.generation)
+        resumed.run(2, report=0)
+        self.assertEqual(straight.population, resumed.population)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from tis100.assembly import DOWN, RIGHT, WRITE
+from tis100.history import History, Watchpoint
+from tis100.puzzle import get_puzzle
+from test_puzzle import AMPLIFIER
+
+
+class HistoryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.engine = self.puzzle.engine(AMPLIFIER, self.puzzle.test_set())
+
+    def testBack(self):
+        history = History(self.engine)
+        snapshots = [self.engine.snapshot()]
+        for _ in range(40):
+            history.step()
+            snapshots.append(self.engine.snapshot())
+        self.assertEqual(40, history.cycles())
+        for cycle in range(39, 19, -1):
+            self.assertTrue(history.back())
+            self.assertEqual(cycle, self.engine.cycle)
+            self.assertEqual(snapshots[cycle], self.engine.snapshot())
+        self.assertEqual(sum(len(values) for values in self.engine.outputs.values()), self.engine.written)
+        # stepping forward again gives the same cycles
+        for cycle in range(21, 41):
+            history.step()
+            self.assertEqual(snapshots[cycle], self.engine.snapshot())
+
+    def testBackToStart(self):
+        history = History(self.engine)
+        start = self.engine.snapshot()
+        for _ in range(10):
+            history.step()
+        while history.back():
+            pass
+        self.assertEqual(0, self.engine.cycle)
+        self.assertEqual(start, self.engine.snapshot())
+
+    def testLimit(self):
+        history = History(self.engine, 50)
+        for _ in range(500):
+            history.step()
+        self.assertTrue(history.size <= 50)
+        self.assertTrue(0 < history.cycles() < 500)
+        self.assertEqual(history.size * 40, history.memory())
+        snapshot = self.engine.snapshot()
+        cycles = history.cycles()
+        while history.back():
+            pass
+        self.assertEqual(500 - cycles, self.engine.cycle)
+        for _ in range(cycles):
+            history.step()
+        self.assertEqual(snapshot, self.engine.snapshot())
+
+    def testBackToWrite(self):
+        history = History(self.engine)
+        for _ in range(30):
+            history.step()
+        written = len(self.engine.outputs[(10, DOWN)])
+        self.assertTrue(written > 0)
+        self.assertTrue(history.back_to_write(10, DOWN))
+        # node 10 is about to finish writing its last value
+        self.assertEqual(WRITE, self.engine.mode[10])
+        self.assertEqual(DOWN, self.engine.port[10])
+        self.assertEqual(written - 1, len(self.engine.outputs[(10, DOWN)]))
+        history.step()
+        self.assertEqual(written, len(self.engine.outputs[(10, DOWN)]))
+        # node 0 never writes, and node 5 only writes RIGHT: the position is kept
+        cycle = self.engine.cycle
+        snapshot = self.engine.snapshot()
+        self.assertFalse(history.back_to_write(0, DOWN))
+        self.assertFalse(history.back_to_write(5, DOWN))
+        self.assertEqual(cycle, self.engine.cycle)
+        self.assertEqual(snapshot, self.engine.snapshot())
+        self.assertTrue(history.back_to_write(5, RIGHT))
+        self.assertEqual(RIGHT, self.engine.port[5])
+
+
+class WatchpointTestCase(unittest.TestCase):
+    def testChange(self):
+        watchpoint = Watchpoint(5)
+        self.assertTrue(watchpoint.hit(1, 2))
+        self.assertFalse(watchpoint.hit(2, 2))
+
+    def testCompare(self):
+        watchpoint = Watchpoint(5, '>', 10)
+        self.assertTrue(watchpoint.hit(10, 11))
+        # only when it starts to be true
+        self.assertFalse(watchpoint.hit(11, 12))
+        self.assertFalse(watchpoint.hit(3, 4))
+        self.assertEqual('acc of node 5 > 10', str(watchpoint))
+        self.assertRaises(Exception, Watchpoint, 5, '=>', 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import random
+import unittest
+from tis100.engine import decode
+from tis100.genetic import GeneticAlgorithm, mutate_node
+from tis100.incremental import IncrementalEvaluator
+from tis100.puzzle import get_puzzle
+from test_puzzle import AMPLIFIER
+
+
+class IncrementalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.test_set = self.puzzle.test_set()
+        self.solution = tuple(decode(p) for p in AMPLIFIER)
+
+    def testSameAsFullEvaluation(self):
+        evaluator = IncrementalEvaluator(self.puzzle, self.test_set, max_cycles=2000, patience=200)
+        grammars = GeneticAlgorithm(self.puzzle, population=1).grammars
+        rng = random.Random(7)
+        parents = [self.solution]
+        evaluator.evaluate(self.solution)
+        for _ in range(300):
+            parent = rng.choice(parents)
+            child = mutate_node(parent, rng, grammars)
+            result = evaluator.evaluate(child, parent).result
+            full = self.puzzle.evaluate(child, self.test_set, 2000, 200)
+            self.assertEqual(vars(full), vars(result))
+            parents.append(child)
+        self.assertTrue(evaluator.saved > 0)
+
+    def counter(self, limit):
+        # the solution, plus a node that gets stuck writing to an empty node
+        # once it has counted to limit
+        programs = list(self.solution)
+        programs[3] = decode('add 1\nsav\nsub {}\njlz skip\nmov 1, left\nskip: swp'.format(limit))
+        return tuple(programs)
+
+    def testUnchangedBehaviourSavesWholeRun(self):
+        evaluator = IncrementalEvaluator(self.puzzle, self.test_set)
+        base = evaluator.evaluate(self.counter(1000))
+        self.assertEqual(0, base.saved)
+        # different program, but it still never uses its ports during the run
+        evaluation = evaluator.evaluate(self.counter(900), self.counter(1000))
+        self.assertEqual(0, evaluation.cycles)
+        self.assertEqual(base.cycles, evaluation.saved)
+        self.assertEqual(vars(base.result), vars(evaluation.result))
+
+    def testLateChangeRestartsFromSnapshot(self):
+        evaluator = IncrementalEvaluator(self.puzzle, self.test_set, interval=8)
+        base = evaluator.evaluate(self.counter(20))
+        evaluation = evaluator.evaluate(self.counter(30), self.counter(20))
+        self.assertEqual(vars(self.puzzle.evaluate(self.counter(30), self.test_set)), vars(evaluation.result))
+        self.assertTrue(80 < evaluation.saved < base.cycles)
+
+    def testGeneticAlgorithm(self):
+        plain = GeneticAlgorithm(self.puzzle, population=12, test_sets=2, seed=4)
+        incremental = GeneticAlgorithm(self.puzzle, population=12, test_sets=2, incremental=True, seed=4)
+        plain.run(5, report=0)
+        incremental.run(5, report=0)
+        self.assertEqual(plain.population, incremental.population)
+        self.assertEqual(plain.best()[0], incremental.best()[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import unittest
+from tis100.assembly import AssemblyChip
+from tis100.engine import decode
+from tis100.genetic import GeneticAlgorithm
+from tis100.memory import Store, deep_size, profile
+from tis100.puzzle import get_puzzle
+from test_puzzle import AMPLIFIER
+
+
+class MemoryTestCase(unittest.TestCase):
+    def testDeepSizeCountsSharedOnce(self):
+        program = decode('mov up, acc\nadd acc\nmov acc, right')
+        shared = [program, program]
+        copies = [program, decode('mov up, acc\nadd acc\nmov acc, right')]
+        self.assertEqual(shared, copies)
+        self.assertTrue(deep_size(shared) < deep_size(copies))
+        # with the program already seen, only the list is counted
+        seen = set()
+        deep_size(program, seen)
+        self.assertEqual(sys.getsizeof([program]), deep_size([program], seen))
+
+    def testStore(self):
+        store = Store()
+        a = store.decode(AMPLIFIER[5])
+        b = store.program(decode(AMPLIFIER[5]))
+        self.assertIs(a, b)
+        self.assertEqual(decode(AMPLIFIER[5]), a)
+        self.assertIs(store.decode(AMPLIFIER[5]), a)
+        candidate = store.candidate(tuple(decode(p) for p in AMPLIFIER))
+        self.assertIs(candidate[1], candidate[10])
+        self.assertIs(candidate[5], a)
+        self.assertEqual(4, len(store))
+        store.keep([candidate[:2]])
+        self.assertEqual(2, len(store))
+        self.assertIsNot(store.decode(AMPLIFIER[5]), a)
+
+    def testProfile(self):
+        candidates = [tuple(decode(p) for p in AMPLIFIER) for _ in range(10)]
+        before = profile(candidates)
+        store = Store()
+        after = profile([store.candidate(c) for c in candidates])
+        self.assertEqual(12, before.nodes)
+        self.assertEqual(before.total, before.per_candidate() * 10)
+        self.assertAlmostEqual(before.per_candidate(), before.per_node() * 12)
+        self.assertTrue(after.total < before.total / 3)
+        self.assertIn('10 candidates', str(after))
+
+    def testChipsShareLines(self):
+        a = AssemblyChip(AMPLIFIER[5])
+        b = AssemblyChip(AMPLIFIER[5].upper())
+        self.assertIs(a.instructions[1], b.instructions[1])
+
+    def testGeneticAlgorithm(self):
+        ga = GeneticAlgorithm(get_puzzle('10981'), population=20, test_sets=1, max_cycles=100, memory=True)
+        ga.run(2, report=0)
+        for candidate in ga.population:
+            for program in candidate:
+                self.assertIs(ga.store.program(program), program)
+        self.assertIn('bytes per candidate', ga.status())
+        self.assertTrue(ga.profile().per_node() > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import pkgutil
+import subprocess
+import sys
+import unittest
+import tis100
+
+OPTIONAL = ['tis100.' + name for name in tis100.OPTIONAL]
+
+
+def imported(statement):
+    # modules loaded by a fresh interpreter after running statement
+    code = '{}\nimport sys\nprint(" ".join(sys.modules))'.format(statement)
+    out = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+    return set(out.split())
+
+
+class PackageTestCase(unittest.TestCase):
+    def testCoreImportsNothingOptional(self):
+        baseline = imported('pass')
+        modules = imported('import tis100.engine, tis100.puzzle') - baseline
+        self.assertEqual(set(['tis100', 'tis100.logger'] + ['tis100.' + name for name in tis100.CORE]), modules)
+
+    def testEveryModuleIsListed(self):
+        # every module of the package is either core or optional (logger is
+        # only a helper of the core), and so are the lazy attributes
+        names = set(name for _, name, _ in pkgutil.iter_modules(tis100.__path__))
+        self.assertEqual(names, set(tis100.CORE) | set(tis100.OPTIONAL) | set(['logger']))
+        self.assertFalse(set(tis100.CORE) & set(tis100.OPTIONAL))
+        self.assertTrue(set(tis100._LAZY.values()) <= names)
+
+    def testPackageImportsNothing(self):
+        modules = imported('import tis100')
+        self.assertNotIn('tis100.engine', modules)
+        self.assertNotIn('importlib', modules - imported('pass'))
+
+    def testLazyAttributes(self):
+        modules = imported('import tis100\ntis100.GeneticAlgorithm')
+        self.assertIn('tis100.genetic', modules)
+        from tis100.engine import Engine
+        self.assertIs(Engine, tis100.Engine)
+        with self.assertRaises(AttributeError):
+            tis100.Bogus
+        self.assertIn('Superoptimizer', dir(tis100))
+
+    def testOptionalSubsystemsLoad(self):
+        modules = imported('import ' + ', '.join(OPTIONAL))
+        self.assertTrue(set(OPTIONAL) <= modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
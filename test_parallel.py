@@ -0,0 +1,68 @@
+import random
+import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from tis100.genetic import GeneticAlgorithm
+from tis100.parallel import PartitionedEngine, evaluate_all, partition
+from tis100.puzzle import get_puzzle
+from test_puzzle import AMPLIFIER
+
+
+class ParallelTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.test_set = self.puzzle.test_set()
+
+    def boards(self, count):
+        # random boards that use their ports, and a known solution
+        ga = GeneticAlgorithm(self.puzzle, population=count, seed=3)
+        return [AMPLIFIER] + ga.population
+
+    def testPartition(self):
+        self.assertEqual([range(0, 4), range(4, 8), range(8, 12)], partition(12, 3))
+        self.assertEqual([range(0, 3), range(3, 5), range(5, 7)], partition(7, 3))
+        self.assertEqual([range(0, 1), range(1, 2)], partition(2, 5))
+
+    def testSameAsSerial(self):
+        # every cycle ends in exactly the same state, whatever the number of threads
+        for programs in self.boards(10):
+            serial = self.puzzle.engine(programs, self.test_set)
+            serial.run(150)
+            for workers in (1, 2, 5, 12):
+                engine = self.puzzle.engine(programs, self.test_set)
+                with PartitionedEngine(engine, workers) as parallel:
+                    parallel.run(150)
+                self.assertEqual(serial.snapshot(), engine.snapshot())
+                self.assertEqual(serial.outputs, engine.outputs)
+
+    def testDeterministic(self):
+        # threads finishing in a different order every run don't change anything
+        programs = AMPLIFIER
+        results = []
+        with ThreadPoolExecutor(4) as executor:
+            for _ in range(5):
+                engine = self.puzzle.engine(programs, self.test_set)
+                parallel = PartitionedEngine(engine, 4, executor)
+                parallel.run(100)
+                results.append((engine.snapshot(), engine.outputs))
+        self.assertEqual(1, len(set(repr(result) for result in results)))
+
+    def testEvaluateAll(self):
+        boards = self.boards(20)
+        rng = random.Random(0)
+        rng.shuffle(boards)
+        serial = [str(self.puzzle.evaluate(programs, self.test_set, 500)) for programs in boards]
+        parallel = [str(result) for result in evaluate_all(self.puzzle, boards, self.test_set, 4, max_cycles=500)]
+        self.assertEqual(serial, parallel)
+        with ProcessPoolExecutor(2) as executor:
+            pooled = evaluate_all(self.puzzle, boards, self.test_set, executor=executor, max_cycles=500)
+        self.assertEqual(serial, [str(result) for result in pooled])
+
+    def testOnlyThreads(self):
+        # processes would step copies of the engine
+        engine = self.puzzle.engine(AMPLIFIER, self.test_set)
+        with ProcessPoolExecutor(1) as executor:
+            self.assertRaises(Exception, PartitionedEngine, engine, 2, executor)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+from tis100.assembly import UP, RIGHT, DOWN, LEFT
+from tis100.puzzle import get_puzzle, grid_neighbors, PUZZLES
+
+AMPLIFIER = ['', 'mov up, down', '', '',
+             '', 'mov up, acc\nadd acc\nmov acc, right', 'mov left, down', '',
+             '', '', 'mov up, down', '']
+
+
+class PuzzleTestCase(unittest.TestCase):
+    def testGridNeighbors(self):
+        neighbors = grid_neighbors(4, 3)
+        self.assertEqual({RIGHT: 1, DOWN: 4}, neighbors[0])
+        self.assertEqual({UP: 1, RIGHT: 6, DOWN: 9, LEFT: 4}, neighbors[5])
+        self.assertEqual({UP: 7, LEFT: 10}, neighbors[11])
+
+    def testTestSetsAreRepeatable(self):
+        puzzle = get_puzzle('20176')
+        self.assertEqual(puzzle.test_set(3).inputs, puzzle.test_set(3).inputs)
+        self.assertNotEqual(puzzle.test_set(3).inputs, puzzle.test_set(4).inputs)
+        for puzzle in PUZZLES.values():
+            test_set = puzzle.test_set()
+            self.assertEqual(len(puzzle.inputs), len(test_set.inputs))
+            self.assertEqual(len(puzzle.outputs), len(test_set.outputs))
+
+    def testSolution(self):
+        puzzle = get_puzzle('10981')
+        result = puzzle.evaluate(AMPLIFIER, puzzle.test_set())
+        self.assertTrue(result.passed, str(result))
+        self.assertEqual(39, result.correct)
+        self.assertEqual(4, result.nodes)
+        self.assertEqual(6, result.instructions)
+
+    def testWrongSolutionStopsEarly(self):
+        puzzle = get_puzzle('10981')
+        programs = AMPLIFIER[:]
+        programs[5] = 'mov up, acc\nmov acc, right'
+        result = puzzle.evaluate(programs, puzzle.test_set())
+        self.assertFalse(result.passed)
+        self.assertEqual(0, result.correct)
+        self.assertTrue(result.cycles < 20)
+
+    def testStuckBoardStops(self):
+        puzzle = get_puzzle('10981')
+        result = puzzle.evaluate(['', 'mov up, acc\nmov acc, right'], puzzle.test_set(), max_cycles=10 ** 6)
+        self.assertFalse(result.passed)
+        self.assertEqual(1, result.read)
+
+    def testConnectedPorts(self):
+        puzzle = get_puzzle('10981')
+        self.assertEqual([UP, RIGHT, DOWN, LEFT], puzzle.connected_ports(1))
+        self.assertEqual([RIGHT, DOWN], puzzle.connected_ports(0))
+        self.assertEqual([UP, RIGHT, DOWN, LEFT], puzzle.connected_ports(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
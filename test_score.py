@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from tis100.puzzle import get_puzzle, format_solution, Result
+from tis100.score import Histogram, Report, Score, percentile, score, score_files, score_solution, \
+    solution_paths, main
+from test_puzzle import AMPLIFIER
+
+
+class ScoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testScore(self):
+        results = [Result(True, 39, 39, 100, 4, 6), Result(True, 39, 39, 103, 4, 6)]
+        total = score(results)
+        self.assertTrue(total.passed)
+        self.assertEqual(101.5, total.cycles)
+        self.assertEqual((4, 6), (total.nodes, total.instructions))
+        self.assertFalse(score(results + [Result(False, 3, 39, 50, 4, 6)]).passed)
+        self.assertEqual('PASSED: 101.5 cycles, 4 nodes, 6 instructions', str(total))
+        # no test sets at all is a failure
+        self.assertFalse(score([]).passed)
+        self.assertFalse(score_solution(self.puzzle, AMPLIFIER, tests=0).passed)
+        with self.assertRaises(SystemExit):
+            main(['--tests', '0', self.dir])
+
+    def testSolution(self):
+        total = score_solution(self.puzzle, AMPLIFIER, tests=2)
+        self.assertTrue(total.passed)
+        self.assertEqual(4, total.nodes)
+        self.assertEqual(6, total.instructions)
+
+    def testCyclesIncludeDrain(self):
+        # the last output arrives after the last input is read and the values
+        # behind it have gone through every node on the way
+        test_set = self.puzzle.test_set()
+        engine = self.puzzle.engine(AMPLIFIER, test_set)
+        reads = []
+
+        def hook(engine, last):
+            if sum(engine.position.values()) == len(test_set.inputs[0]) and not reads:
+                reads.append(engine.cycle)
+        result = self.puzzle.run(engine, test_set, hook=hook)
+        self.assertTrue(result.passed)
+        self.assertEqual(engine.cycle, result.cycles)
+        self.assertTrue(result.cycles >= reads[0] + 5)
+
+    def testCountedWhileRunning(self):
+        # a wrong value stops the run at once, and only the values before it count
+        programs = AMPLIFIER[:]
+        programs[5] = 'mov up, acc\nadd acc\njgz a\nmov 5, acc\na: mov acc, right'
+        test_set = self.puzzle.test_set()
+        test_set.inputs = [[10, 20, -3, 40]]
+        test_set.outputs = [[20, 40, -6, 80]]
+        result = self.puzzle.evaluate(programs, test_set)
+        self.assertFalse(result.passed)
+        self.assertEqual(2, result.correct)
+
+    def testPercentile(self):
+        values = list(range(1, 11))
+        self.assertEqual([1, 3, 5, 9, 10], [percentile(values, p) for p in (10, 25, 50, 90, 100)])
+        self.assertIsNone(percentile([], 50))
+
+    def testHistogram(self):
+        histogram = Histogram([5, 1, 2, 2, 3, 9, 10], bins=5)
+        self.assertEqual([1, 3, 5, 7, 9], histogram.starts)
+        self.assertEqual([3, 1, 1, 0, 2], histogram.counts)
+        self.assertEqual(7, sum(histogram.counts))
+        self.assertEqual(100.0, histogram.rank(1))
+        self.assertAlmostEqual(200.0 / 7, histogram.rank(9))
+        self.assertEqual(5, len(histogram.render()))
+        self.assertEqual([], Histogram([]).counts)
+
+    def testReport(self):
+        scores = [Score(True, 100 + k, 4, 6 + k % 3) for k in range(20)] + [Score(False, 50, 1, 1)]
+        report = Report(scores)
+        self.assertEqual(20, len(report.passed))
+        rank = report.rank(Score(True, 100, 4, 9))
+        self.assertEqual(100.0, rank['cycles'])
+        self.assertEqual(0.0, rank['instructions'])
+        text = str(report)
+        self.assertIn('21 solutions, 20 passed', text)
+        self.assertIn('cycles: p10 101', text)
+
+    def testBulk(self):
+        os.mkdir(os.path.join(self.dir, 'more'))
+        paths = []
+        for k in range(6):
+            programs = AMPLIFIER[:]
+            programs[5] = 'mov up, acc\n' + 'nop\n' * k + 'add acc\nmov acc, right'
+            paths.append(os.path.join(self.dir, 'more' if k % 2 else '', '10981.{}.txt'.format(k)))
+            with open(paths[-1], 'w') as f:
+                f.write(format_solution(programs))
+        with open(os.path.join(self.dir, '99999.0.txt'), 'w') as f:
+            f.write('@0\n')
+        found = solution_paths([self.dir])
+        self.assertEqual(7, len(found))
+        with ThreadPoolExecutor(2) as executor:
+            scored = score_files(found, executor=executor, tests=1)
+        errors = [error for _, _, error in scored if error]
+        self.assertEqual(['unknown puzzle 99999'], errors)
+        scores = dict((os.path.basename(path), result) for path, result, _ in scored if result)
+        self.assertEqual(6, len(scores))
+        self.assertTrue(scores['10981.0.txt'].cycles < scores['10981.5.txt'].cycles)
+        # with worker processes
+        self.assertEqual([str(result) for _, result, _ in scored],
+                         [str(result) for _, result, _ in score_files(found, workers=2, tests=1)])
+        self.assertEqual(0, main([self.dir, '--tests', '1', '--workers', '1']))
+
+
+if __name__ == '__main__':
+    unittest.main()
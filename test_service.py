@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from tis100.puzzle import get_puzzle, format_solution
+from tis100.service import Client, Service, serve_unix
+from test_puzzle import AMPLIFIER
+
+
+class ServiceTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.executor = ThreadPoolExecutor(2)
+        self.service = Service(2, 4, self.executor)
+
+    async def asyncTearDown(self):
+        await self.service.stop()
+        self.executor.shutdown()
+        shutil.rmtree(self.dir)
+
+    def request(self, programs=AMPLIFIER, **kwargs):
+        return dict(puzzle='10981', programs=programs, **kwargs)
+
+    async def serve(self):
+        # a server and a client talking over a Unix socket
+        path = os.path.join(self.dir, 'socket')
+        self.service.start()
+        server = asyncio.ensure_future(serve_unix(self.service, path))
+        while not os.path.exists(path):
+            await asyncio.sleep(0.01)
+        client = await Client.connect(path)
+
+        async def close():
+            await client.close()
+            server.cancel()
+            await asyncio.gather(server, return_exceptions=True)
+        self.addAsyncCleanup(close)
+        return client
+
+    async def testEvaluate(self):
+        client = await self.serve()
+        results = await client.evaluate('10981', AMPLIFIER, tests=2)
+        puzzle = get_puzzle('10981')
+        self.assertEqual([puzzle.evaluate(AMPLIFIER, puzzle.test_set(n)).cycles for n in range(2)],
+                         [result['cycles'] for result in results])
+        self.assertTrue(all(result['passed'] for result in results))
+
+    async def testManyAtOnce(self):
+        client = await self.serve()
+        broken = AMPLIFIER[:10] + ['']
+        boards = [AMPLIFIER, broken] * 10
+        results = await client.evaluate_all('10981', boards, max_cycles=500)
+        self.assertEqual([True, False] * 10, [r[0]['passed'] for r in results])
+        stats = await client.stats()
+        self.assertEqual(20, stats['submitted'])
+        self.assertEqual(20, stats['evaluated'] + stats['deduplicated'])
+        self.assertEqual(0, stats['inflight'])
+
+    async def testErrors(self):
+        client = await self.serve()
+        for request in [dict(puzzle='99999', programs=[]), dict(puzzle='10981'),
+                        self.request(['bogus instruction'])]:
+            with self.assertRaises(Exception):
+                await client.request(request)
+        # the connection still works
+        results = await client.evaluate('10981', AMPLIFIER)
+        self.assertTrue(results[0]['passed'])
+
+    async def testSolutionText(self):
+        client = await self.serve()
+        response = await client.request(dict(puzzle='10981', solution=format_solution(AMPLIFIER)))
+        self.assertTrue(response['results'][0]['passed'])
+
+    async def testDeduplicate(self):
+        # nothing is evaluated until the service starts
+        first = await self.service.submit(self.request())
+        second = await self.service.submit(self.request(programs=[p + '\n' for p in AMPLIFIER]))
+        self.assertIs(first, second)
+        self.service.start()
+        self.assertEqual(await first, await second)
+        self.assertEqual(1, self.service.evaluated)
+        self.assertEqual(1, self.service.deduplicated)
+
+    async def testBackpressure(self):
+        # the queue holds 4 jobs, the fifth has to wait until a worker takes one
+        futures = [await self.service.submit(self.request(seed=n)) for n in range(4)]
+        fifth = asyncio.ensure_future(self.service.submit(self.request(seed=4)))
+        await asyncio.sleep(0.05)
+        self.assertFalse(fifth.done())
+        self.service.start()
+        futures.append(await fifth)
+        results = await asyncio.gather(*futures)
+        self.assertTrue(all(r[0]['passed'] for r in results))
+
+
+class StdioTestCase(unittest.TestCase):
+    def testStdio(self):
+        root = os.path.dirname(os.path.abspath(__file__))
+        requests = [dict(id=1, puzzle='10981', programs=AMPLIFIER, tests=2), dict(id=2, puzzle='nope', programs=[])]
+        out = subprocess.run([sys.executable, '-m', 'tis100.service', '--stdio', '--workers', '1'], cwd=root,
+                             input=''.join(json.dumps(r) + '\n' for r in requests), stdout=subprocess.PIPE,
+                             universal_newlines=True, timeout=60, check=True).stdout
+        responses = dict((r['id'], r) for r in map(json.loads, out.splitlines()))
+        self.assertEqual([True, True], [r['passed'] for r in responses[1]['results']])
+        self.assertEqual('unknown puzzle nope', responses[2]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import random
+import unittest
+from tis100.assembly import MOV, NEG, UP, DOWN, JMP, ADD
+from tis100.engine import decode
+from tis100.grammar import Grammar, is_useful, useless
+from tis100.superopt import Superoptimizer, run_node, splice, used_ports
+
+
+class GrammarTestCase(unittest.TestCase):
+    def testMutateStaysValid(self):
+        grammar = Grammar()
+        rng = random.Random(1)
+        program = decode('a: mov up, acc\njez a\nmov acc, down')
+        for _ in range(500):
+            program = grammar.mutate(program, rng)
+            self.assertTrue(1 <= len(program) <= 15)
+            for op, a, b in program:
+                if op in ('jmp', 'jez', 'jnz', 'jgz', 'jlz'):
+                    self.assertTrue(0 <= a < len(program))
+
+    def testIsUseful(self):
+        self.assertFalse(is_useful(((NEG, None, None), (NEG, None, None), (ADD, 1, None))))
+        self.assertTrue(is_useful(((NEG, None, None), (NEG, None, None), (JMP, 1, None))))
+        self.assertFalse(is_useful(((JMP, 0, None), (ADD, 1, None))))
+        self.assertEqual(2, useless(decode('nop\nadd 1\nneg\nneg\nadd 2')))
+
+
+class SuperoptTestCase(unittest.TestCase):
+    def testUsedPorts(self):
+        self.assertEqual(((UP,), (DOWN,)), used_ports(decode('mov up, acc\nmov acc, down')))
+
+    def testRunNode(self):
+        run = run_node(decode('mov up, acc\nneg\nmov acc, down'), {UP: [1, 2]}, [DOWN])
+        self.assertEqual([-1, -2], run.outputs[DOWN])
+        # stuck waiting for a third input value, the last write was cycle 10
+        self.assertEqual(10, run.cycles)
+
+    def testSplice(self):
+        program = decode('a: add 1\nadd 2\nb: add 3\njmp b\njmp a')
+        self.assertEqual(decode('a: add 1\nb: add 3\njmp b\njmp a'), splice(program, 1, 1, ()))
+        self.assertEqual(decode('a: add 1\nneg\nb: add 3\njmp b\njmp a'),
+                         splice(program, 1, 1, ((NEG, None, None),)))
+
+    def testFindsCascade(self):
+        optimizer = Superoptimizer('mov up, acc\nmov acc, down')
+        best = optimizer.enumerate(max_length=1)
+        self.assertEqual(((MOV, UP, DOWN),), best[0].program)
+        self.assertTrue(best[0].cycles < optimizer.cycles)
+
+    def testPeepholeRemovesDeadCode(self):
+        optimizer = Superoptimizer('mov up, acc\nsav\nadd acc\nmov acc, down')
+        best = optimizer.peephole(window=1, size=0)
+        self.assertEqual(decode('mov up, acc\nadd acc\nmov acc, down'), best[-1].program)
+
+    def testPeepholeAroundUselessCode(self):
+        # the NOPs outside the window don't stop the window from being replaced
+        optimizer = Superoptimizer('mov up, acc\nnop\nadd 1\nnop\nmov acc, down')
+        best = optimizer.peephole(window=2, size=1)
+        self.assertTrue(optimizer.tried > 0)
+        self.assertTrue(best)
+        self.assertTrue(best[-1].instructions < optimizer.instructions)
+        optimizer = Superoptimizer('mov up, acc\nneg\nneg\nadd 1\nsav\nsav\nmov acc, down')
+        best = optimizer.peephole(window=2, size=1)
+        self.assertTrue(best[-1].instructions < optimizer.instructions)
+        # but a candidate can't add more of it
+        self.assertFalse(optimizer.is_useful(decode('nop\nmov up, acc\nneg\nneg\nadd 1\nsav\nsav\nmov acc, down')))
+
+    def testStochasticOnlyKeepsEquivalent(self):
+        optimizer = Superoptimizer('mov up, acc\nadd 1\nadd 1\nmov acc, down', seed=3)
+        for improvement in optimizer.stochastic(iterations=300):
+            self.assertIsNotNone(optimizer.check(improvement.program))
+
+
+if __name__ == '__main__':
+    unittest.main()
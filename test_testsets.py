@@ -0,0 +1,68 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from tis100.puzzle import get_puzzle
+from tis100.testsets import interleaved, pooled
+from test_puzzle import AMPLIFIER
+
+
+class TestSetsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.puzzle = get_puzzle('10981')
+        self.test_sets = [self.puzzle.test_set(n) for n in range(4)]
+
+    def expected(self, programs):
+        return [str(self.puzzle.evaluate(programs, test_set)) for test_set in self.test_sets]
+
+    def testInterleaved(self):
+        evaluation = interleaved(self.puzzle, AMPLIFIER, self.test_sets, every=7)
+        self.assertTrue(evaluation.passed())
+        self.assertIsNone(evaluation.failed())
+        self.assertEqual(self.expected(AMPLIFIER), [str(result) for result in evaluation.results()])
+        for k, run in enumerate(evaluation.runs):
+            self.assertEqual(k, run.index)
+            self.assertTrue(run.simulated >= run.result.cycles)
+            self.assertTrue(run.elapsed > 0)
+        self.assertTrue(evaluation.elapsed >= sum(run.elapsed for run in evaluation.runs))
+
+    def testInterleavedStopsEarly(self):
+        # only the third test set has a negative input, which this gets wrong
+        programs = AMPLIFIER[:]
+        programs[5] = 'mov up, acc\njlz x\nadd acc\nx: mov acc, right'
+        self.test_sets[2].inputs = [[-5] + self.test_sets[2].inputs[0][1:]]
+        self.test_sets[2].outputs = [[-10] + self.test_sets[2].outputs[0][1:]]
+        evaluation = interleaved(self.puzzle, programs, self.test_sets, every=10)
+        self.assertFalse(evaluation.passed())
+        self.assertEqual(2, evaluation.failed())
+        self.assertEqual(1, len(evaluation.results()))
+        for k in (0, 1, 3):
+            self.assertIsNone(evaluation.runs[k].result)
+        # the runs took turns, and the failure came in the first turn
+        self.assertEqual([10, 10, 0], [evaluation.runs[k].simulated for k in (0, 1, 3)])
+        self.assertIn('stopped after', str(evaluation.runs[0]))
+        evaluation = interleaved(self.puzzle, programs, self.test_sets, stop_early=False)
+        self.assertEqual(4, len(evaluation.results()))
+        self.assertEqual(2, evaluation.failed())
+
+    def testPooled(self):
+        with ThreadPoolExecutor(2) as executor:
+            evaluation = pooled(self.puzzle, AMPLIFIER, self.test_sets, executor=executor)
+        self.assertTrue(evaluation.passed())
+        self.assertEqual(self.expected(AMPLIFIER), [str(result) for result in evaluation.results()])
+        self.assertEqual([0, 1, 2, 3], [run.index for run in evaluation.runs])
+
+    def testPooledStopsEarly(self):
+        programs = AMPLIFIER[:]
+        programs[10] = ''
+        with ThreadPoolExecutor(1) as executor:
+            evaluation = pooled(self.puzzle, programs, self.test_sets, executor=executor)
+        self.assertFalse(evaluation.passed())
+        self.assertEqual(0, evaluation.failed())
+        self.assertTrue(len(evaluation.results()) < 4)
+
+    def testProcesses(self):
+        evaluation = pooled(self.puzzle, AMPLIFIER, self.test_sets[:2], workers=2)
+        self.assertEqual(self.expected(AMPLIFIER)[:2], [str(result) for result in evaluation.results()])
+
+
+if __name__ == '__main__':
+    unittest.main()
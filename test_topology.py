@@ -0,0 +1,81 @@
+import unittest
+from tis100.assembly import AssemblyChip, UP, RIGHT, DOWN, LEFT
+from tis100.engine import Engine
+from tis100.genetic import GeneticAlgorithm
+from tis100.puzzle import Puzzle, get_puzzle, grid_neighbors
+from tis100.topology import Topology, NONE, neighbor_table, neighbor_dicts
+from test_puzzle import AMPLIFIER
+
+
+def amplifier(disabled):
+    # 10981 with some of its nodes disabled
+    puzzle = get_puzzle('10981')
+    return Puzzle('test', 'AMPLIFIER', puzzle.inputs, puzzle.outputs, puzzle.generate, disabled=disabled)
+
+
+class TopologyTestCase(unittest.TestCase):
+    def testTable(self):
+        topology = Topology(4, 3)
+        self.assertEqual(48, len(topology.table))
+        self.assertEqual(6, topology.neighbor(5, RIGHT))
+        self.assertEqual(NONE, topology.neighbor(0, UP))
+        self.assertEqual(grid_neighbors(4, 3), topology.neighbors)
+        self.assertEqual(topology.table, neighbor_table(topology.neighbors))
+        self.assertEqual(topology.neighbors, neighbor_dicts(topology.table))
+
+    def testDisabled(self):
+        topology = Topology(4, 3, disabled=[5])
+        self.assertEqual({}, topology.neighbors[5])
+        self.assertEqual({LEFT: 0, RIGHT: 2}, topology.neighbors[1])
+        self.assertEqual(NONE, topology.neighbor(4, RIGHT))
+        self.assertEqual(11, len(topology.enabled()))
+        self.assertRaises(Exception, Topology, 4, 3, [12])
+
+    def testInputsAndOutputs(self):
+        topology = Topology(4, 3, inputs=[(1, UP)], outputs=[(10, DOWN), (7, RIGHT)])
+        self.assertEqual([UP, RIGHT, DOWN, LEFT], topology.connected_ports(1))
+        self.assertEqual([UP, RIGHT, DOWN, LEFT], topology.connected_ports(7))
+        self.assertRaises(Exception, Topology, 4, 3, inputs=[(5, UP)])
+        self.assertRaises(Exception, Topology, 4, 3, disabled=[1], inputs=[(1, UP)])
+
+    def testPuzzle(self):
+        puzzle = amplifier([2, 3])
+        self.assertTrue(puzzle.evaluate(AMPLIFIER, puzzle.test_set()).passed)
+        self.assertEqual([UP, DOWN, LEFT], puzzle.connected_ports(1))
+        # the amplifier goes through node 6
+        puzzle = amplifier([6])
+        self.assertRaises(Exception, puzzle.evaluate, AMPLIFIER, puzzle.test_set())
+
+    def testBlockedByDisabledNode(self):
+        engine = Engine(['mov 1, right', '', 'mov left, acc'], Topology(3, 1, disabled=[1]))
+        engine.run(10)
+        self.assertEqual(0, engine.acc[2])
+
+    def testChips(self):
+        chips = [AssemblyChip() for _ in range(6)]
+        Topology(3, 2, disabled=[4]).connect(chips)
+        self.assertIs(chips[1], chips[0].get_neighbor(RIGHT))
+        self.assertIsNone(chips[1].get_neighbor(DOWN))
+        self.assertEqual({}, chips[4].neighbors)
+
+    def testLargeBoard(self):
+        width = height = 100
+        topology = Topology(width, height, disabled=range(0, width * height, 7))
+        programs = ['mov up, acc\nadd 1\nmov acc, down'] * (width * height)
+        for i in topology.disabled:
+            programs[i] = ''
+        engine = Engine(programs, topology, dict(((col, UP), [1, 2, 3]) for col in range(1, width, 7)))
+        engine.run(20)
+        self.assertEqual(20, engine.cycle)
+        self.assertEqual(NONE, topology.neighbor(width * height - 1, RIGHT))
+
+    def testGeneticAlgorithmSkipsDisabledNodes(self):
+        ga = GeneticAlgorithm(amplifier([0, 3, 8]), population=20, test_sets=1, max_cycles=50)
+        ga.run(3, report=0)
+        for candidate in ga.population:
+            for i in (0, 3, 8):
+                self.assertEqual((), candidate[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+# Python implementation of TIS-100.
+#
+# Importing the package imports nothing else. The core simulator is
+#   tis100.assembly   constants and the reference AssemblyChip
+#   tis100.engine     the fast engine (decode, encode, Engine)
+#   tis100.topology   grid sizes, disabled nodes and neighbor tables
+#   tis100.puzzle     puzzles, test sets and evaluation
+# and only needs the standard library's builtin modules, so it imports in a
+# few milliseconds (see benchmarks/importtime.py). Everything else is an
+# optional subsystem, listed in OPTIONAL, that is only loaded when it is
+# first used. test_package.py and benchmarks/importtime.py go by these two
+# lists, and a new module has to be added to one of them.
+#
+# The most used names can also be reached from the package itself, like
+# tis100.Engine or tis100.GeneticAlgorithm, which imports the module that
+# defines them on first access.
+
+CORE = ('assembly', 'topology', 'engine', 'puzzle')
+OPTIONAL = ('grammar', 'superopt', 'genetic', 'incremental', 'render', 'cli', 'parallel', 'service', 'fuzz',
+            'analysis', 'history', 'memory', 'score', 'testsets')
+
+_LAZY = {
+    'AssemblyChip': 'assembly',
+    'Engine': 'engine',
+    'decode': 'engine',
+    'encode': 'engine',
+    'Topology': 'topology',
+    'Puzzle': 'puzzle',
+    'TestSet': 'puzzle',
+    'Result': 'puzzle',
+    'get_puzzle': 'puzzle',
+    'load_solution': 'puzzle',
+    'Grammar': 'grammar',
+    'Superoptimizer': 'superopt',
+    'GeneticAlgorithm': 'genetic',
+    'IncrementalEvaluator': 'incremental',
+    'Stepper': 'cli',
+    'PartitionedEngine': 'parallel',
+    'Service': 'service',
+    'analyze': 'analysis',
+    'History': 'history',
+    'Store': 'memory',
+    'Report': 'score',
+    'Evaluation': 'testsets',
+}
+
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError('module {} has no attribute {}'.format(__name__, name))
+    import importlib
+    value = getattr(importlib.import_module('.' + _LAZY[name], __name__), name)
+    # later lookups find it directly
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
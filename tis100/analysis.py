@@ -0,0 +1,219 @@
+from .assembly import ACC, NIL, MOV, ADD, SUB, JMP, JRO, reverse
+from .engine import PORTS, JUMPS, decode
+
+# Static analysis of a board, without running it.
+#
+# From the decoded programs it works out which ports every node reads from
+# and writes to (only counting instructions that can be reached from the
+# start of the program), and builds the port graph of the board: which
+# node can send values to which. That finds
+#   - reads and writes on a port that leads nowhere (no neighbor, input or
+#     output), which block forever when they are reached
+#   - reads and writes that no neighbor will ever answer, because it never
+#     writes to (or reads from) the facing port
+#   - outputs that nothing writes to, that can't get any values from an
+#     input, or that are written fewer times than the puzzle expects values
+#     (when no write is on a loop, each one happens at most once)
+# The last kind means the board can't possibly pass, so it can be rejected
+# without simulating it (see GeneticAlgorithm(prune=True)).
+#
+# It also estimates the fewest cycles between two values of every output.
+# The node writing the output has to go around a loop of its program that
+# includes the write, and a read or write takes at least 2 cycles (3 when
+# the value read is written straight back out). Assuming every value makes
+# one trip through each node upstream, their loops hold it up too.
+#
+# Outputs that don't get values from any input are only impossible because
+# the outputs of every puzzle depend on its inputs.
+
+# issues that block a node forever when it gets to them
+NOWHERE = 'nowhere'
+UNMATCHED = 'unmatched'
+# issues that mean the board can't pass
+NO_WRITER = 'no writer'
+NO_INPUT = 'no input'
+ONCE = 'once'
+IMPOSSIBLE = (NO_WRITER, NO_INPUT, ONCE)
+
+
+class Issue:
+    def __init__(self, kind, node, port, message):
+        self.kind = kind
+        self.node = node
+        self.port = port
+        self.message = message
+
+    def __str__(self):
+        return 'node {}: {}'.format(self.node, self.message)
+
+
+def successors(program, idx):
+    # instructions that can follow instruction idx
+    op, a, _ = program[idx]
+    n = len(program)
+    if op == JMP:
+        return [a]
+    if op in JUMPS:
+        return sorted(set([a, (idx + 1) % n]))
+    if op == JRO:
+        if a == ACC:
+            return list(range(n))
+        offset = 0 if a == NIL else a
+        return [min(max(idx + offset, 0), n - 1)]
+    return [(idx + 1) % n]
+
+
+def reachable(program):
+    # indexes of the instructions that can run, starting from the first one
+    if not program:
+        return []
+    seen = set([0])
+    todo = [0]
+    while todo:
+        for k in successors(program, todo.pop()):
+            if k not in seen:
+                seen.add(k)
+                todo.append(k)
+    return sorted(seen)
+
+
+def cost(instruction):
+    # fewest cycles an instruction can take
+    op, a, b = instruction
+    reads = op in (MOV, ADD, SUB) and a in PORTS
+    writes = op == MOV and b in PORTS
+    if reads and writes:
+        return 3
+    if reads or writes:
+        return 2
+    return 1
+
+
+def shortest_loop(program, idx):
+    # fewest cycles to get from instruction idx back to it, None when it can't happen again
+    best = {}
+    todo = [(cost(program[idx]), k) for k in successors(program, idx)]
+    while todo:
+        todo.sort()
+        cycles, k = todo.pop(0)
+        if k == idx:
+            return cycles
+        if k in best:
+            continue
+        best[k] = cycles
+        todo.extend((cycles + cost(program[k]), j) for j in successors(program, k) if j not in best)
+    return None
+
+
+def port_use(program):
+    # {port: [instruction indexes]} of the reachable reads and writes
+    reads = {}
+    writes = {}
+    for idx in reachable(program):
+        op, a, b = program[idx]
+        if op in (MOV, ADD, SUB) and a in PORTS:
+            reads.setdefault(a, []).append(idx)
+        if op == MOV and b in PORTS:
+            writes.setdefault(b, []).append(idx)
+    return reads, writes
+
+
+class Analysis:
+    def __init__(self, puzzle, programs):
+        self.puzzle = puzzle
+        self.programs = [decode(p) if isinstance(p, str) else p for p in programs]
+        self.programs += [()] * (puzzle.width * puzzle.height - len(self.programs))
+        uses = [port_use(program) for program in self.programs]
+        # per node, {port: [instruction indexes]} of its reads and writes
+        self.reads = [use[0] for use in uses]
+        self.writes = [use[1] for use in uses]
+        # node -> nodes it can send values to
+        self.graph = [set() for _ in self.programs]
+        self.issues = []
+        self._check_ports()
+        self._check_outputs()
+
+    def _check_ports(self):
+        inputs = set(self.puzzle.input_ports())
+        outputs = set(self.puzzle.output_ports())
+        neighbors = self.puzzle.neighbors
+        for i in range(len(self.programs)):
+            for port in self.reads[i]:
+                j = neighbors[i].get(port)
+                if (i, port) in inputs:
+                    continue
+                if j is None:
+                    self.issues.append(Issue(NOWHERE, i, port, 'reads from {}, which leads nowhere'.format(port)))
+                elif reverse(port) not in self.writes[j]:
+                    self.issues.append(Issue(UNMATCHED, i, port,
+                                             'reads from {}, but node {} never writes to it'.format(port, j)))
+            for port in self.writes[i]:
+                j = neighbors[i].get(port)
+                if (i, port) in outputs:
+                    continue
+                if j is None:
+                    self.issues.append(Issue(NOWHERE, i, port, 'writes to {}, which leads nowhere'.format(port)))
+                elif reverse(port) not in self.reads[j]:
+                    self.issues.append(Issue(UNMATCHED, i, port,
+                                             'writes to {}, but node {} never reads from it'.format(port, j)))
+                else:
+                    self.graph[i].add(j)
+
+    def sources(self, node):
+        # nodes that can send values to node, directly or not, including node
+        res = set([node])
+        todo = [node]
+        while todo:
+            j = todo.pop()
+            for i, targets in enumerate(self.graph):
+                if j in targets and i not in res:
+                    res.add(i)
+                    todo.append(i)
+        return res
+
+    def loop(self, node, ports=None):
+        # fewest cycles between two writes of node (to one of ports), None if it writes at most once
+        loops = [shortest_loop(self.programs[node], idx)
+                 for port, indexes in self.writes[node].items() if ports is None or port in ports
+                 for idx in indexes]
+        loops = [cycles for cycles in loops if cycles is not None]
+        return min(loops) if loops else None
+
+    def _check_outputs(self):
+        # output port -> estimated fewest cycles per value, None when it can't be written more than once
+        self.cycles_per_output = {}
+        readers = set(i for i, port in self.puzzle.input_ports() if port in self.reads[i])
+        for node, port in self.puzzle.output_ports():
+            self.cycles_per_output[(node, port)] = None
+            if port not in self.writes[node]:
+                self.issues.append(Issue(NO_WRITER, node, port, 'never writes to output {}'.format(port)))
+                continue
+            sources = self.sources(node)
+            if not sources & readers:
+                self.issues.append(Issue(NO_INPUT, node, port,
+                                         'output {} gets no values from any input'.format(port)))
+            loops = [self.loop(node, [port])] + [self.loop(i) for i in sources if i != node]
+            if loops[0] is None:
+                # no write is on a loop, so every reachable one happens at most once
+                count = len(self.writes[node][port])
+                if self.puzzle.length > count:
+                    times = 'once' if count == 1 else '{} times'.format(count)
+                    self.issues.append(Issue(ONCE, node, port, 'writes to output {} at most {}, but {} values are '
+                                             'expected'.format(port, times, self.puzzle.length)))
+                continue
+            self.cycles_per_output[(node, port)] = max(cycles for cycles in loops if cycles is not None)
+
+    def impossible(self):
+        # whether the board can't pass, whatever the test set
+        return any(issue.kind in IMPOSSIBLE for issue in self.issues)
+
+    def report(self):
+        res = [str(issue) for issue in self.issues]
+        for (node, port), cycles in sorted(self.cycles_per_output.items()):
+            if cycles is not None:
+                res.append('output of node {} ({}): about {} cycles per value'.format(node, port, cycles))
+        return '\n'.join(res)
+
+
+def analyze(puzzle, programs):
+    return Analysis(puzzle, programs)
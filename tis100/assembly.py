@@ -0,0 +1,513 @@
+from sys import intern
+
+from .logger import debug, trace
+
+# re is only needed by AssemblyChip, so it is imported where it is used.
+# That keeps importing the constants below (which the fast engine and
+# everything else builds on) from pulling in re and its dependencies.
+
+
+# globals
+# states
+RUN = 'run'
+READ = 'read'
+WRITE = 'wrte'
+
+# directions / destinations
+UP = 'up'
+RIGHT = 'right'
+DOWN = 'down'
+LEFT = 'left'
+ANY = 'any'
+LAST = 'last'
+NIL = 'nil'
+
+# opcodes
+NOP = 'nop'
+MOV = 'mov'
+ADD = 'add'
+SUB = 'sub'
+NEG = 'neg'
+SWP = 'swp'
+SAV = 'sav'
+JMP = 'jmp'
+JEZ = 'jez'
+JNZ = 'jnz'
+JLZ = 'jlz'
+JGZ = 'jgz'
+JRO = 'jro'
+
+# other constants
+ACC = 'acc'
+ACC_ADD = 'acc_add'
+ACC_SUB = 'acc_sub'
+ACC_MOV = 'acc_mov'
+
+
+def reverse(direction):
+    if direction == UP:
+        return DOWN
+    if direction == DOWN:
+        return UP
+    if direction == RIGHT:
+        return LEFT
+    if direction == LEFT:
+        return RIGHT
+    raise Exception('unknown direction: {}'.format(direction))
+
+
+def is_number(text):
+    import re
+    return re.match('-?\d+', text) is not None
+
+
+def global_inc(chips):
+    # End of a cycle of the board made of chips: every chip has run, so the
+    # channels of these chips (and no others) commit the reads and writes
+    # that were requested while they ran.
+    Channel.commit(chips)
+    AssemblyChip.global_pc += 1
+
+
+def run_cycle(chips):
+    # run one cycle of a whole board, in any order
+    for chip in chips:
+        chip.run()
+    global_inc(chips)
+
+
+class Channel:
+    # One direction of the connection between two neighboring chips.
+    #
+    # A channel holds a single value. Every cycle has two phases:
+    #   1. compute: chips run, and a chip that wants to write to or read from
+    #      a port only registers that with the channel (offer/request).
+    #   2. commit: once every chip has run, global_inc() commits the
+    #      channels of the board. A value moves from writer to reader when both
+    #      were registered in an earlier cycle, then everything registered
+    #      this cycle becomes visible for the next one.
+    # A chip never looks at the state of its neighbors, so the order the
+    # chips run in doesn't matter, and a read or write takes at least 2 cycles.
+    # Nothing is shared between boards, so any number of them can be stepped
+    # in any order, or from different threads.
+
+    def __init__(self, writer, reader):
+        self.writer = writer
+        self.reader = reader
+        # the value written, once it can be read
+        self.full = False
+        self.value = None
+        # where the reader puts the value (see AssemblyChip.read_state), once it can be read
+        self.destination = None
+        # registered this cycle, visible from the next one
+        self.offered = None
+        self.requested = None
+        self.is_active = False
+
+    def offer(self, value):
+        self.offered = value
+        self._activate()
+
+    def request(self, destination):
+        self.requested = destination
+        self._activate()
+
+    def _activate(self):
+        # there is something to commit
+        self.is_active = True
+
+    def transfer(self):
+        if not self.full or self.destination is None:
+            return
+        value, destination = self.value, self.destination
+        self.full = False
+        self.value = None
+        self.destination = None
+        debug('{} wrote {} to {}'.format(self.writer.name, value, self.reader.name))
+        self.writer.write_done()
+        self.reader.read_done(value, destination)
+
+    def settle(self):
+        if self.offered is not None:
+            self.full = True
+            self.value = self.offered
+            self.offered = None
+        if self.requested is not None:
+            self.destination = self.requested
+            self.requested = None
+        # a value without a reader (or the other way around) waits for the
+        # next offer or request, which makes the channel active again
+        self.is_active = self.full and self.destination is not None
+
+    @staticmethod
+    def active(chips):
+        # the channels of a board with something to commit
+        return [channel for chip in chips for channel in chip.outgoing.values() if channel.is_active]
+
+    @staticmethod
+    def commit(chips):
+        # Commit the channels of a board. Transfers only change the chips at
+        # both ends of a channel and register new requests (a cascade writes
+        # the value it read straight back out), so all of them happen before
+        # anything registered this cycle becomes visible.
+        for channel in Channel.active(chips):
+            channel.transfer()
+        for channel in Channel.active(chips):
+            channel.settle()
+
+
+def _port(direction):
+    # property for the neighbor in one direction, chip.right = other connects them
+    def get(self):
+        return self.neighbors.get(direction)
+
+    def set(self, other):
+        self.connect(direction, other)
+    return property(get, set)
+
+
+class AssemblyChip:
+    # ops = 'add sub neg mov swp sav jro jmp jez jnz jgz jlz'.split()
+    global_pc = 0
+    chip_num = 1
+
+    def __init__(self, program=None, name=None):
+        # TODO track the number of instructions executed in order to track idle percentage
+        # name of this chip
+        if name is None:
+            self.name = 'chip{}'.format(AssemblyChip.chip_num)
+        else:
+            self.name = name
+        AssemblyChip.chip_num += 1
+        # current cycle
+        self.cycle = 0
+        # current program counter, relative to list of instructions
+        self.pc = 0
+        # current state of this chip, which can be RUN, READ, WRITE
+        self.state = RUN
+        # register values
+        self.acc = 0
+        self.bak = 0
+        # port being read from or written to, and the value being written
+        self.port = None
+        self.value = None
+        # list of instructions (limited to 15)
+        self.instructions = []
+        self.code = []
+        self.labels = {}
+        # neighboring chips, and the channels to and from them, by direction
+        self.neighbors = {}
+        self.outgoing = {}
+        self.incoming = {}
+        if program:
+            self.parse(program)
+
+    def parse(self, program):
+        # TODO enforce 15 as max number of instructions
+        program = program.lower()
+        self.instructions = []
+        for line in program.splitlines():
+            # TODO limit instructions to 20 chars in length
+            i = line.find('#')
+            if i >= 0:
+                line = line[:i]
+            # find labels
+            if ':' in line:
+                label, _ = line.split(':')
+                label = label.strip()
+                self.labels[label] = len(self.instructions)
+            # identical lines of every chip share one string
+            line = intern(line.strip())
+            self.instructions.append(line)
+        # indexes of the lines that hold an instruction
+        self.code = [idx for idx, line in enumerate(self.instructions) if line.split(':')[-1].strip()]
+        # start at the first instruction, not a blank line or a label
+        self.next_valid_instruction()
+
+    def get_instruction(self):
+        import re
+        instruction = self.instructions[self.pc]
+        instruction = re.sub(r'(.*:)|(#.*)', '', instruction).replace(',', ' ').strip()
+        return instruction
+
+    def jump_to_label(self, label):
+        if label not in self.labels:
+            raise Exception('unknown label {} at line {}'.format(label, self.pc))
+        self.pc = self.labels[label]
+        self.next_valid_instruction()
+
+    up = _port(UP)
+    right = _port(RIGHT)
+    down = _port(DOWN)
+    left = _port(LEFT)
+
+    def connect(self, direction, other):
+        # connect a port to the facing port of other, with a channel for
+        # each way values can travel
+        facing = reverse(direction)
+        if other is None:
+            self.neighbors.pop(direction, None)
+            self.outgoing.pop(direction, None)
+            self.incoming.pop(direction, None)
+            return
+        if self.neighbors.get(direction) is other and other.neighbors.get(facing) is self:
+            return
+        self.neighbors[direction] = other
+        other.neighbors[facing] = self
+        self.outgoing[direction] = other.incoming[facing] = Channel(self, other)
+        self.incoming[direction] = other.outgoing[facing] = Channel(other, self)
+
+    def get_neighbor(self, direction):
+        if direction not in (UP, RIGHT, DOWN, LEFT):
+            raise Exception('unknown direction {}'.format(direction))
+        return self.neighbors.get(direction)
+
+    def write_state(self, direction, value):
+        # Go into a WRITE state. Writing to a port without a neighbor
+        # blocks forever.
+        # TODO handle ANY/LAST
+        self.state = WRITE
+        self.port = direction
+        self.value = value
+        channel = self.outgoing.get(direction)
+        if channel is not None:
+            channel.offer(value)
+
+    def read_state(self, direction, destination):
+        # Go into a READ state, where destination is ACC_MOV, ACC_ADD,
+        # ACC_SUB, NIL or a port to write the value to
+        self.state = READ
+        self.port = direction
+        channel = self.incoming.get(direction)
+        if channel is not None:
+            channel.request(destination)
+
+    def run_state(self):
+        self.state = RUN
+
+    def write_done(self):
+        # called by the channel when the value we wrote was read
+        self.run_state()
+        self.pcinc()
+
+    def read_done(self, value, destination):
+        # called by the channel with the value we were waiting for
+        debug('{} read {}'.format(self.name, value))
+        # CASCADE
+        # if the destination of our read is a port leading to another chip
+        # then we write the value this cycle
+        if destination in [LEFT, UP, RIGHT, DOWN, ANY, LAST]:
+            self.write_state(destination, value)
+            return
+        # if destination is nil or a register, we go back into a run state next cycle
+        if destination == ACC_ADD:
+            self.add(value)
+        elif destination == ACC_SUB:
+            self.sub(value)
+        elif destination == ACC_MOV:
+            self.set_acc(value)
+        elif destination == NIL:
+            pass
+        self.run_state()
+        self.pcinc()
+
+    def run_many(self, num):
+        for i in range(num):
+            self.run()
+
+    def run(self):
+        self.cycle += 1
+        if self.state in (READ, WRITE):
+            # waiting: reads and writes are completed by the channels when
+            # the cycle is committed
+            pass
+        elif self.state == RUN and self.code:
+            # (a chip without any instructions never does anything)
+            instruction = self.get_instruction()
+            parts = instruction.split()
+            opcode = parts.pop(0)
+            trace('opcode is {}'.format(opcode))
+            # TODO: assert rest of line is empty after we've processed an instruction
+            # maybe split into jumps and not jumps?
+            if opcode == NOP:
+                pass
+            elif opcode == MOV:
+                src = parts.pop(0)
+                dst = parts.pop(0)
+
+                if src in [LEFT, UP, RIGHT, DOWN, ANY, LAST]:
+                    if dst == ACC:
+                        self.read_state(src, ACC_MOV)
+                    else:
+                        # MOV LEFT, RIGHT
+                        # MOV RIGHT, DOWN
+                        # MOV DOWN, ANY
+                        self.read_state(src, dst)
+                else:
+                    # a constant, ACC or NIL
+                    val = self.value_of(src, instruction)
+                    if dst == ACC:
+                        # MOV 55, ACC
+                        # MOV ACC, ACC
+                        self.set_acc(val)
+                    elif dst == NIL:
+                        # basically a nop
+                        # MOV 17, NIL
+                        pass
+                    elif dst in [LEFT, UP, RIGHT, DOWN, ANY, LAST]:
+                        # WRITE: move a constant or acc to a port
+                        # MOV 17, LEFT
+                        # MOV ACC, ANY
+                        self.write_state(dst, val)
+                    else:
+                        raise Exception('illegal instruction: "{}"'.format(instruction))
+            elif opcode == ADD:
+                val = parts.pop(0)
+                if val in [LEFT, UP, RIGHT, DOWN, ANY, LAST]:
+                    # read from one of our ports and add to acc register
+                    trace('instruction "{}" adding from {} to acc'.format(instruction, val))
+                    self.read_state(val, ACC_ADD)
+                else:
+                    val = self.value_of(val, instruction)
+                    trace('add instruction, val is {}'.format(val))
+                    self.add(val)
+            elif opcode == SUB:
+                val = parts.pop(0)
+                if val in [LEFT, UP, RIGHT, DOWN, ANY, LAST]:
+                    trace('instruction "{}" subtracting from {} to acc'.format(instruction, val))
+                    self.read_state(val, ACC_SUB)
+                else:
+                    val = self.value_of(val, instruction)
+                    trace('sub instruction, val is {}'.format(val))
+                    self.sub(val)
+            elif opcode == NEG:
+                self.acc = -self.acc
+            elif opcode == SAV:
+                self.bak = self.acc
+            elif opcode == SWP:
+                self.acc, self.bak = self.bak, self.acc
+            elif opcode in [JMP, JEZ, JNZ, JGZ, JLZ, JRO]:
+                # jump instruction
+                branch_taken = False
+                if opcode == JMP:
+                    label = parts.pop(0)
+                    self.jump_to_label(label)
+                    branch_taken = True
+                elif opcode == JEZ:
+                    label = parts.pop(0)
+                    if self.acc == 0:
+                        self.jump_to_label(label)
+                        branch_taken = True
+                elif opcode == JNZ:
+                    label = parts.pop(0)
+                    if self.acc != 0:
+                        self.jump_to_label(label)
+                        branch_taken = True
+                elif opcode == JGZ:
+                    label = parts.pop(0)
+                    if self.acc > 0:
+                        self.jump_to_label(label)
+                        branch_taken = True
+                elif opcode == JLZ:
+                    label = parts.pop(0)
+                    if self.acc < 0:
+                        self.jump_to_label(label)
+                        branch_taken = True
+                elif opcode == JRO:
+                    # the offset counts instructions, not lines, and stops
+                    # at the first and the last instruction
+                    offset = self.value_of(parts.pop(0), instruction)
+                    idx = self.code.index(self.pc) + offset
+                    self.pc = self.code[min(max(idx, 0), len(self.code) - 1)]
+                    branch_taken = True
+
+                if not branch_taken:
+                    self.pcinc()
+            else:
+                raise Exception('unknown opcode at line {} for instruction "{}'.format(self.pc, instruction))
+
+            # increment program counter so long as:
+            # we are in the RUN state
+            # we did not just execute a jump instruction (jump instructions either increment or not on their own)
+            if self.state == RUN and opcode not in [JMP, JNZ, JEZ, JGZ, JLZ, JRO]:
+                self.pcinc()
+
+    def next_valid_instruction(self):
+        import re
+        if not self.code:
+            return
+        # keep incrementing program counter (pc) past blank lines and labels
+        while re.sub(r'.*:', '', self.instructions[self.pc]).strip() == '':
+            self.pc += 1
+            self.pc %= len(self.instructions)
+
+    def pcinc(self):
+        trace('incrementing pc for {} to {}'.format(self.name, self.pc))
+        self.pc += 1
+        self.pc %= len(self.instructions)
+        self.next_valid_instruction()
+        trace('{} just incremented to {}'.format(self.name, self.pc))
+
+    def value_of(self, src, instruction):
+        # value of a constant (which saturates like acc does), ACC or NIL
+        if is_number(src):
+            return max(-999, min(999, int(src)))
+        if src == ACC:
+            return self.acc
+        if src == NIL:
+            return 0
+        raise Exception('illegal instruction: "{}"'.format(instruction))
+
+    def bounds_check(self):
+        if self.acc > 999:
+            self.acc = 999
+        if self.acc < -999:
+            self.acc = -999
+
+    def add(self, value):
+        self.acc += value
+        self.bounds_check()
+
+    def sub(self, value):
+        self.add(-value)
+
+    def set_acc(self, value):
+        self.acc = value
+        self.bounds_check()
+
+    def str_instructions(self):
+        width = 20
+        res = [''.ljust(width)+'|'] * 15
+        for idx, instruction in enumerate(self.instructions):
+            if idx == self.pc:
+                res[idx] = ('*'+instruction).ljust(width) + '|'
+            else:
+                res[idx] = instruction.ljust(width) + '|'
+
+        def quad(title, value, location, idx):
+            location[idx] += title.ljust(4) + '|'
+            location[idx + 1] += str(value).ljust(4) + '|'
+            location[idx + 2] += '-' * 5
+
+        # acc
+        quad('ACC', str(self.acc), res, 0)
+        # bak
+        quad('BAK', str(self.bak), res, 3)
+        # TODO last
+        quad('LAST', 'todo', res, 6)
+        # mode
+        quad('MODE', self.state, res, 9)
+        # TODO idle
+        quad('IDLE', 'todo', res, 12)
+        return res
+
+    def __str__(self):
+        # TODO: create an array of size 15 with | at the end of each line
+        # then put the necessary values (acc, bak, state, etc)
+        # at the ends of the appropriate lines, and be sure to pad everything out
+        # use a helper to return just the array
+        # and use .join('\n') for the actual __str__ method
+        res = self.str_instructions()
+        return '{} / {} / {}\n'.format(self.name, self.cycle, AssemblyChip.global_pc) + \
+            '\n'.join(res)
+
@@ -0,0 +1,283 @@
+import argparse
+import os
+import sys
+import time
+
+from .assembly import RUN
+from .engine import source_lines
+from .history import History, Watchpoint, LIMIT as HISTORY
+from .puzzle import get_puzzle, load_solution, MAX_CYCLES
+from .render import render_board, render_node
+from .score import score
+from .testsets import interleaved, pooled
+
+# Command line runner.
+#
+#   python -m tis100.cli run SOLUTION [--puzzle ID] [--tests N] [--workers N] [--keep-going]
+#       run every test set headless at full speed and print a summary. The
+#       test sets take turns in this process, or run on worker processes,
+#       and it stops at the first one that fails.
+#   python -m tis100.cli run SOLUTION --cycles N
+#       fast-forward N cycles of the first test set and print the board once,
+#       without keeping any history
+#   python -m tis100.cli step SOLUTION [--history N]
+#       interactive stepper, type 'help' for its commands. It can also step
+#       backwards through the last N changes (see history.py), 0 turns that off
+#
+# Solutions use the game's save format. When --puzzle is not given, the
+# puzzle id is taken from the file name, like the game's 10981.0.txt.
+
+HELP = '''commands:
+  s [N]            step 1 or N cycles (enter steps 1)
+  b NODE:LINE      toggle a breakpoint before line LINE (counting from 1) of node NODE
+  c                continue until a breakpoint or watchpoint is reached
+  o K              run until K output values have been written
+  w NODE [OP N]    toggle a watchpoint on ACC of NODE, stopping when it changes,
+                   or when it starts to be OP N (OP is one of == != < <= > >=)
+  r [N]            step back 1 or N cycles
+  rc               go back until a breakpoint or watchpoint is reached
+  rw NODE PORT     go back to just before NODE last wrote to PORT
+  p [NODE]         print the board, or a single node
+  q                quit'''
+
+# reasons a Stepper stops running
+CYCLES = 'cycles'
+BREAKPOINT = 'breakpoint'
+OUTPUT = 'output'
+STUCK = 'stuck'
+LIMIT = 'limit'
+WATCHPOINT = 'watchpoint'
+WRITTEN = 'write'
+START = 'start of history'
+
+
+class Stepper:
+    def __init__(self, puzzle, sources, test_set, max_cycles=MAX_CYCLES, history=HISTORY):
+        self.puzzle = puzzle
+        self.sources = sources + [''] * (puzzle.width * puzzle.height - len(sources))
+        self.engine = puzzle.engine(self.sources, test_set)
+        self.max_cycles = max_cycles
+        # undo history holding at most `history` changes, None (or 0) for no history
+        self.history = History(self.engine, history) if history else None
+        # (node, instruction index) pairs
+        self.breakpoints = set()
+        self.watchpoints = []
+
+    def toggle_breakpoint(self, node, line):
+        # line counts source lines from 1, the breakpoint is on the first
+        # instruction at or after it
+        lines = source_lines(self.sources[node])
+        idx = next((k for k, lineno in enumerate(lines) if lineno >= line - 1), None)
+        if idx is None:
+            raise Exception('node {} has no instruction at or after line {}'.format(node, line))
+        self.breakpoints ^= set([(node, idx)])
+        return (node, idx) in self.breakpoints
+
+    def toggle_watchpoint(self, node, op=None, value=None):
+        watchpoint = Watchpoint(node, op, value)
+        for other in self.watchpoints:
+            if str(other) == str(watchpoint):
+                self.watchpoints.remove(other)
+                return False
+        self.watchpoints.append(watchpoint)
+        return True
+
+    def _watched(self, before, after):
+        # before, after: ACC of the watched nodes
+        return any(w.hit(a, b) for w, a, b in zip(self.watchpoints, before, after))
+
+    def _accs(self):
+        return [self.engine.acc[w.node] for w in self.watchpoints]
+
+    def _breakpoint(self):
+        engine = self.engine
+        return any(engine.mode[i] == RUN and engine.pc[i] == idx for i, idx in self.breakpoints)
+
+    def _run(self, stop, cycles=None):
+        # step until stop() is true or a watchpoint is hit; returns the reason for stopping
+        engine = self.engine
+        end = self.max_cycles
+        if cycles is not None:
+            end = min(end, engine.cycle + cycles)
+        step = engine.step if self.history is None else self.history.step
+        watchpoints = self.watchpoints
+        while engine.cycle < end:
+            if watchpoints:
+                before = self._accs()
+            if not step():
+                return STUCK
+            if watchpoints and self._watched(before, self._accs()):
+                return WATCHPOINT
+            if stop():
+                return stop.reason
+        return LIMIT if engine.cycle >= self.max_cycles else CYCLES
+
+    def run(self, cycles):
+        return self._run(_never, cycles)
+
+    def run_until_breakpoint(self):
+        def stop():
+            return self._breakpoint()
+        stop.reason = BREAKPOINT
+        return self._run(stop)
+
+    def run_until_output(self, count):
+        engine = self.engine
+
+        def stop():
+            return engine.output_count() >= count
+        stop.reason = OUTPUT
+        if engine.output_count() >= count:
+            return OUTPUT
+        return self._run(stop)
+
+    def _history(self):
+        if self.history is None:
+            raise Exception('no history to step back through')
+        return self.history
+
+    def back(self, cycles=1):
+        self._history()
+        for _ in range(cycles):
+            if not self.history.back():
+                return START
+        return CYCLES
+
+    def reverse_continue(self):
+        # step back until a breakpoint is reached, or a watchpoint would
+        # have stopped the cycle that was undone
+        self._history()
+        while True:
+            after = self._accs()
+            if not self.history.back():
+                return START
+            if self._watched(self._accs(), after):
+                return WATCHPOINT
+            if self._breakpoint():
+                return BREAKPOINT
+
+    def back_to_write(self, node, port):
+        return WRITTEN if self._history().back_to_write(node, port) else START
+
+    def render(self, node=None):
+        if node is None:
+            return render_board(self.engine, self.sources, self.puzzle.width)
+        return '\n'.join(render_node(self.engine, node, self.sources[node]))
+
+
+def _never():
+    return False
+
+
+def interactive(stepper, read=input, write=print):
+    write(stepper.render())
+    while True:
+        try:
+            line = read('> ').strip()
+        except EOFError:
+            break
+        parts = line.split()
+        command = parts[0] if parts else 's'
+        args = parts[1:]
+        try:
+            if command == 'q':
+                break
+            elif command == 'help':
+                write(HELP)
+                continue
+            elif command == 's':
+                reason = stepper.run(int(args[0]) if args else 1)
+            elif command == 'b':
+                node, line = args[0].split(':')
+                added = stepper.toggle_breakpoint(int(node), int(line))
+                write('breakpoint {} node {} line {}'.format('added' if added else 'removed', node, line))
+                continue
+            elif command == 'c':
+                reason = stepper.run_until_breakpoint()
+            elif command == 'o':
+                reason = stepper.run_until_output(int(args[0]))
+            elif command == 'w':
+                node = int(args[0])
+                op, value = (args[1], int(args[2])) if len(args) > 1 else (None, None)
+                added = stepper.toggle_watchpoint(node, op, value)
+                write('watchpoint {} {}'.format('added' if added else 'removed', Watchpoint(node, op, value)))
+                continue
+            elif command == 'r':
+                reason = stepper.back(int(args[0]) if args else 1)
+            elif command == 'rc':
+                reason = stepper.reverse_continue()
+            elif command == 'rw':
+                reason = stepper.back_to_write(int(args[0]), args[1].lower())
+            elif command == 'p':
+                write(stepper.render(int(args[0]) if args else None))
+                continue
+            else:
+                write('unknown command {}, type help for a list'.format(command))
+                continue
+        except (IndexError, ValueError):
+            write('bad arguments, type help for a list')
+            continue
+        except Exception as e:
+            write(str(e))
+            continue
+        write(stepper.render())
+        if reason != CYCLES:
+            write('stopped: {}'.format(reason))
+
+
+def puzzle_for(path, id=None):
+    if id is None:
+        id = os.path.basename(path).split('.')[0]
+    return get_puzzle(id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='run TIS-100 solutions')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+    run = commands.add_parser('run', help='run a solution headless')
+    step = commands.add_parser('step', help='step through a solution interactively')
+    for command in (run, step):
+        command.add_argument('solution', help='solution file in the game format')
+        command.add_argument('--puzzle', help='puzzle id (default: from the file name)')
+        command.add_argument('--seed', type=int, default=0, help='first test set')
+        command.add_argument('--max-cycles', type=int, default=MAX_CYCLES)
+    step.add_argument('--history', type=int, default=HISTORY, help='most changes kept for stepping back')
+    run.add_argument('--tests', type=int, default=3, help='number of test sets')
+    run.add_argument('--cycles', type=int, help='fast-forward this many cycles and print the board')
+    run.add_argument('--workers', type=int, default=0,
+                     help='run the test sets on this many worker processes (default: take turns in this one)')
+    run.add_argument('--keep-going', action='store_true', help="don't stop at the first test set that fails")
+    args = parser.parse_args(argv)
+    if args.command == 'run' and args.tests < 1:
+        run.error('--tests must be at least 1')
+
+    puzzle = puzzle_for(args.solution, args.puzzle)
+    sources = load_solution(args.solution)
+    if args.command == 'step':
+        interactive(Stepper(puzzle, sources, puzzle.test_set(args.seed), args.max_cycles, args.history))
+    elif args.cycles is not None:
+        stepper = Stepper(puzzle, sources, puzzle.test_set(args.seed), args.max_cycles, history=None)
+        start = time.time()
+        reason = stepper.run(args.cycles)
+        elapsed = time.time() - start
+        print(stepper.render())
+        print('stopped: {} after {} cycles in {:.3f}s'.format(reason, stepper.engine.cycle, elapsed))
+    else:
+        print('{} {}'.format(puzzle.id, puzzle.name))
+        test_sets = [puzzle.test_set(seed) for seed in range(args.seed, args.seed + args.tests)]
+        options = dict(max_cycles=args.max_cycles, stop_early=not args.keep_going)
+        if args.workers:
+            evaluation = pooled(puzzle, sources, test_sets, args.workers, **options)
+        else:
+            evaluation = interleaved(puzzle, sources, test_sets, **options)
+        for run in evaluation.runs:
+            run.index += args.seed
+            print(run)
+        print('score {} ({:.3f}s)'.format(score(evaluation.results()), evaluation.elapsed))
+        return 0 if evaluation.passed() else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
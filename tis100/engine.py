@@ -0,0 +1,353 @@
+from .assembly import RUN, READ, WRITE, UP, RIGHT, DOWN, LEFT, NIL, ACC, ACC_ADD, ACC_SUB, ACC_MOV, \
+    NOP, MOV, ADD, SUB, NEG, SWP, SAV, JMP, JEZ, JNZ, JLZ, JGZ, JRO
+from .topology import Topology, SLOT, FACING, NONE, neighbor_table
+
+# Fast engine.
+#
+# AssemblyChip re-parses the text of an instruction every cycle. The engine
+# decodes each program once into a tuple of (opcode, a, b) instructions,
+# with numbers turned into ints and labels resolved into instruction indexes,
+# and then steps a whole board of nodes using flat per-node state lists.
+#
+# Every cycle has two phases, so results don't depend on the order nodes
+# are visited in:
+#   1. every node in the RUN state executes one instruction. Reads and writes
+#      only register a request, stamped with the current cycle.
+#   2. port transfers happen between a READ and a WRITE that face each other,
+#      as long as both requests were made in an earlier cycle. Both nodes
+#      move on to their next instruction in the following cycle.
+# A read or write therefore takes at least 2 cycles, just like AssemblyChip.
+
+PORTS = (UP, RIGHT, DOWN, LEFT)
+JUMPS = (JMP, JEZ, JNZ, JLZ, JGZ)
+MAX_INSTRUCTIONS = 15
+MAX_VALUE = 999
+
+
+def clamp(value):
+    if value > MAX_VALUE:
+        return MAX_VALUE
+    if value < -MAX_VALUE:
+        return -MAX_VALUE
+    return value
+
+
+def split_instruction(line):
+    # 'MOV UP, ACC' -> ['mov', 'up', 'acc']
+    return line.lower().replace(',', ' ').split()
+
+
+def parse_lines(program):
+    # Returns (lines, labels), where lines is a list of
+    # (source line number, tokens) for every line holding an instruction,
+    # and labels maps label names to indexes into that list.
+    lines = []
+    labels = {}
+    for lineno, line in enumerate(program.splitlines()):
+        i = line.find('#')
+        if i >= 0:
+            line = line[:i]
+        if ':' in line:
+            label, line = line.split(':', 1)
+            label = label.strip().lower()
+            if label in labels:
+                raise Exception('duplicate label {} at line {}'.format(label, lineno))
+            labels[label] = len(lines)
+        tokens = split_instruction(line)
+        if tokens:
+            lines.append((lineno, tokens))
+    return lines, labels
+
+
+def source_lines(program):
+    # source line number of every decoded instruction
+    lines, _ = parse_lines(program)
+    return [lineno for lineno, _ in lines]
+
+
+def _operand(token, allowed, lineno):
+    if token in allowed:
+        return token
+    try:
+        return clamp(int(token))
+    except ValueError:
+        raise Exception('illegal operand {} at line {}'.format(token, lineno))
+
+
+def _expect(tokens, count, lineno):
+    if len(tokens) != count + 1:
+        raise Exception('{} expects {} operand(s) at line {}'.format(tokens[0], count, lineno))
+
+
+def decode(program):
+    lines, labels = parse_lines(program)
+    if len(lines) > MAX_INSTRUCTIONS:
+        raise Exception('too many instructions: {} (limit is {})'.format(len(lines), MAX_INSTRUCTIONS))
+    sources = PORTS + (ACC, NIL)
+    destinations = PORTS + (ACC, NIL)
+    instructions = []
+    for lineno, tokens in lines:
+        opcode = tokens[0]
+        if opcode in (NOP, NEG, SWP, SAV):
+            _expect(tokens, 0, lineno)
+            instructions.append((opcode, None, None))
+        elif opcode == MOV:
+            _expect(tokens, 2, lineno)
+            src = _operand(tokens[1], sources, lineno)
+            if tokens[2] not in destinations:
+                raise Exception('illegal destination {} at line {}'.format(tokens[2], lineno))
+            instructions.append((MOV, src, tokens[2]))
+        elif opcode in (ADD, SUB):
+            _expect(tokens, 1, lineno)
+            instructions.append((opcode, _operand(tokens[1], sources, lineno), None))
+        elif opcode in JUMPS:
+            _expect(tokens, 1, lineno)
+            label = tokens[1]
+            if label not in labels:
+                raise Exception('unknown label {} at line {}'.format(label, lineno))
+            # a label after the last instruction wraps around to the first one
+            target = labels[label]
+            if target == len(lines):
+                target = 0
+            instructions.append((opcode, target, None))
+        elif opcode == JRO:
+            _expect(tokens, 1, lineno)
+            instructions.append((JRO, _operand(tokens[1], (ACC, NIL), lineno), None))
+        else:
+            raise Exception('unknown opcode {} at line {}'.format(opcode, lineno))
+    return tuple(instructions)
+
+
+def encode(instructions):
+    # inverse of decode(), giving jump targets labels of the form L<index>
+    targets = set(a for op, a, _ in instructions if op in JUMPS)
+    res = []
+    for idx, (op, a, b) in enumerate(instructions):
+        if op in JUMPS:
+            text = '{} L{}'.format(op, a)
+        elif op == MOV:
+            text = '{} {}, {}'.format(op, a, b)
+        elif a is not None:
+            text = '{} {}'.format(op, a)
+        else:
+            text = op
+        if idx in targets:
+            text = 'L{}: {}'.format(idx, text)
+        res.append(text.upper())
+    return '\n'.join(res)
+
+
+class Engine:
+    def __init__(self, programs, neighbors=None, inputs=None, outputs=()):
+        # programs: one decoded program (or program text) per node
+        # neighbors: a topology.Topology, or one dict per node mapping a
+        #   direction to a node index
+        # inputs: dict mapping (node, direction) to the values fed into that port
+        # outputs: (node, direction) ports whose writes are collected in self.outputs
+        self.programs = [decode(p) if isinstance(p, str) else p for p in programs]
+        n = len(self.programs)
+        if neighbors is None:
+            neighbors = [{} for _ in range(n)]
+        if isinstance(neighbors, Topology):
+            neighbors.check(self.programs)
+            self.table = neighbors.table
+            neighbors = neighbors.neighbors
+        else:
+            self.table = neighbor_table(neighbors)
+        self.neighbors = neighbors
+        # nodes with a program, the only ones that ever run
+        self.nodes = [i for i, program in enumerate(self.programs) if program]
+        self.inputs = dict(inputs or {})
+        self.outputs = dict((port, []) for port in outputs)
+        # number of values written to all outputs
+        self.written = 0
+        self.cycle = 0
+        self.acc = [0] * n
+        self.bak = [0] * n
+        self.pc = [0] * n
+        self.mode = [RUN] * n
+        # port being read from or written to
+        self.port = [None] * n
+        # value waiting to be written
+        self.value = [None] * n
+        # where the value of a read goes: ACC_MOV, ACC_ADD, ACC_SUB, NIL or a port
+        self.dst = [None] * n
+        # cycle in which the current read/write was requested
+        self.issued = [0] * n
+        # how many values have been read from each input
+        self.position = dict((port, 0) for port in self.inputs)
+
+    def snapshot(self):
+        return (self.cycle, self.acc[:], self.bak[:], self.pc[:], self.mode[:], self.port[:],
+                self.value[:], self.dst[:], self.issued[:], dict(self.position),
+                dict((port, len(values)) for port, values in self.outputs.items()))
+
+    def restore(self, snapshot):
+        (self.cycle, acc, bak, pc, mode, port, value, dst, issued, position, lengths) = snapshot
+        self.acc, self.bak, self.pc, self.mode = acc[:], bak[:], pc[:], mode[:]
+        self.port, self.value, self.dst, self.issued = port[:], value[:], dst[:], issued[:]
+        self.position = dict(position)
+        for key, length in lengths.items():
+            del self.outputs[key][length:]
+        self.written = sum(lengths.values())
+
+    def node_state(self, i):
+        return (self.acc[i], self.bak[i], self.pc[i], self.mode[i], self.port[i],
+                self.value[i], self.dst[i], self.issued[i])
+
+    def step(self):
+        self.cycle += 1
+        nodes = self.nodes
+        active = self.execute(nodes)
+        # False when every node is blocked, and so will stay blocked forever
+        return self.commit(self.transfers(nodes)) or active
+
+    # A cycle is split into three parts, so that nodes can be stepped by
+    # several threads at once (see parallel.py):
+    #   execute(nodes)      phase 1 for some of the nodes. A node only
+    #                       changes its own state.
+    #   transfers(nodes)    decides which reads and writes of these nodes
+    #                       complete, without changing anything.
+    #   commit(transfers)   phase 2: applies them.
+    # execute() and transfers() can run on any partition of the nodes in
+    # parallel, as long as all of execute() happens before transfers().
+
+    def execute(self, nodes):
+        # phase 1 for the given nodes of the current cycle, returns whether any of them ran
+        cycle = self.cycle
+        programs = self.programs
+        acc, bak, pc, mode = self.acc, self.bak, self.pc, self.mode
+        port, value, dst, issued = self.port, self.value, self.dst, self.issued
+        active = False
+        for i in nodes:
+            program = programs[i]
+            if mode[i] != RUN or not program:
+                continue
+            active = True
+            op, a, b = program[pc[i]]
+            if op == MOV:
+                if a in PORTS:
+                    mode[i] = READ
+                    port[i] = a
+                    dst[i] = ACC_MOV if b == ACC else b
+                    issued[i] = cycle
+                    continue
+                v = acc[i] if a == ACC else 0 if a == NIL else a
+                if b == ACC:
+                    acc[i] = v
+                elif b != NIL:
+                    mode[i] = WRITE
+                    port[i] = b
+                    value[i] = v
+                    issued[i] = cycle
+                    continue
+            elif op == ADD or op == SUB:
+                if a in PORTS:
+                    mode[i] = READ
+                    port[i] = a
+                    dst[i] = ACC_ADD if op == ADD else ACC_SUB
+                    issued[i] = cycle
+                    continue
+                v = acc[i] if a == ACC else 0 if a == NIL else a
+                acc[i] = clamp(acc[i] + v if op == ADD else acc[i] - v)
+            elif op == NEG:
+                acc[i] = -acc[i]
+            elif op == SAV:
+                bak[i] = acc[i]
+            elif op == SWP:
+                acc[i], bak[i] = bak[i], acc[i]
+            elif op == JMP or \
+                    (op == JEZ and acc[i] == 0) or \
+                    (op == JNZ and acc[i] != 0) or \
+                    (op == JGZ and acc[i] > 0) or \
+                    (op == JLZ and acc[i] < 0):
+                pc[i] = a
+                continue
+            elif op == JRO:
+                target = pc[i] + (acc[i] if a == ACC else 0 if a == NIL else a)
+                pc[i] = min(max(target, 0), len(program) - 1)
+                continue
+            pc[i] = (pc[i] + 1) % len(program)
+        return active
+
+    def transfers(self, nodes):
+        # The reads and writes of the given nodes that complete this cycle,
+        # as (reader, writer, value, port) tuples:
+        #   (i, j, v, None)   node i reads v from its neighbor j
+        #   (i, None, v, key) node i reads v from the input key
+        #   (None, j, v, key) node j writes v to the output key
+        # Both sides of a transfer must have been requested in an earlier cycle.
+        cycle = self.cycle
+        mode, port, value, issued = self.mode, self.port, self.value, self.issued
+        table, inputs, outputs, position = self.table, self.inputs, self.outputs, self.position
+        res = []
+        for i in nodes:
+            if issued[i] >= cycle:
+                continue
+            if mode[i] == READ:
+                p = port[i]
+                key = (i, p)
+                if key in inputs:
+                    k = position[key]
+                    if k < len(inputs[key]):
+                        res.append((i, None, inputs[key][k], key))
+                    continue
+                j = table[4 * i + SLOT[p]]
+                if j == NONE or mode[j] != WRITE or port[j] != FACING[p] or issued[j] >= cycle:
+                    continue
+                res.append((i, j, value[j], None))
+            elif mode[i] == WRITE:
+                key = (i, port[i])
+                if key in outputs:
+                    res.append((None, i, value[i], key))
+        return res
+
+    def commit(self, transfers):
+        # phase 2: apply the transfers of every node, returns whether there were any
+        cycle = self.cycle
+        programs = self.programs
+        acc, pc, mode, port, value, dst, issued = \
+            self.acc, self.pc, self.mode, self.port, self.value, self.dst, self.issued
+        for i, j, v, key in transfers:
+            if j is not None:
+                mode[j] = RUN
+                pc[j] = (pc[j] + 1) % len(programs[j])
+                if i is None:
+                    self.outputs[key].append(v)
+                    self.written += 1
+                    continue
+            else:
+                self.position[key] += 1
+            d = dst[i]
+            if d in PORTS:
+                # cascade: the value read is written straight back out
+                mode[i] = WRITE
+                port[i] = d
+                value[i] = v
+                issued[i] = cycle
+                continue
+            if d == ACC_MOV:
+                acc[i] = v
+            elif d == ACC_ADD:
+                acc[i] = clamp(acc[i] + v)
+            elif d == ACC_SUB:
+                acc[i] = clamp(acc[i] - v)
+            mode[i] = RUN
+            pc[i] = (pc[i] + 1) % len(programs[i])
+        return len(transfers) > 0
+
+    def run(self, cycles):
+        for _ in range(cycles):
+            self.step()
+
+    def run_until(self, done, max_cycles):
+        # step until done(self) is true, giving up after max_cycles cycles.
+        # Returns whether done(self) was reached.
+        while not done(self):
+            if self.cycle >= max_cycles:
+                return False
+            self.step()
+        return True
+
+    def output_count(self):
+        return self.written
@@ -0,0 +1,452 @@
+import random
+
+from . import logger
+from .assembly import AssemblyChip, run_cycle, reverse, RUN, WRITE, UP, RIGHT, DOWN, LEFT, ACC, NIL, \
+    NOP, MOV, ADD, SUB, NEG, SWP, SAV, JMP, JEZ, JNZ, JLZ, JGZ, JRO
+from .engine import Engine, MAX_VALUE, decode, source_lines
+from .parallel import PartitionedEngine
+from .topology import Topology
+
+# Differential fuzzing of the engines.
+#
+# Random boards of random (but valid) programs run on AssemblyChip, which is
+# the reference, and on every other engine in ENGINES. After every cycle the
+# state of every node (mode, source line, ACC, BAK, the port it is blocked
+# on and the value it is writing) and the values written to every output
+# have to be the same everywhere. When they aren't, the board is shrunk to
+# a smaller one that still disagrees, which makes a readable test case.
+#
+# Some boards have inputs and outputs on the edge of the grid. On the
+# reference they are extra chips outside the grid: a Source writes the
+# values of an input one by one and then blocks, a Sink keeps reading.
+#
+#   python -m tis100.fuzz [--boards N] [--cycles N] [--seed N]
+#
+# The programs go out of their way to hit the corners: JRO past either end,
+# ACC saturating at +-999, values cascading through mov left, right, labels
+# on their own line, on an instruction line and after the last instruction,
+# comments, upper case, and operands without a comma.
+#
+# AssemblyChip logs every transfer at debug level, so the log is kept at
+# info level while boards run.
+
+PORTS = (UP, RIGHT, DOWN, LEFT)
+LABELS = ['a', 'b', 'loop', 'start', 'x1', 'end']
+CYCLES = 60
+
+
+class Board:
+    def __init__(self, width, height, programs, inputs=None, outputs=()):
+        # programs: one program text per node
+        # inputs: dict mapping (node, direction) ports on the edge to the values fed into them
+        # outputs: (node, direction) ports on the edge whose values are compared
+        self.width = width
+        self.height = height
+        self.programs = programs
+        self.inputs = dict(inputs or {})
+        self.outputs = tuple(outputs)
+
+    def topology(self):
+        return Topology(self.width, self.height, inputs=sorted(self.inputs), outputs=self.outputs)
+
+    def with_programs(self, programs):
+        return Board(self.width, self.height, programs, self.inputs, self.outputs)
+
+    def __str__(self):
+        res = ['input {} {}: {}'.format(node, direction, ' '.join(str(v) for v in values))
+               for (node, direction), values in sorted(self.inputs.items())]
+        res.extend('output {} {}'.format(node, direction) for node, direction in self.outputs)
+        res.extend('@{}\n{}\n'.format(i, program) for i, program in enumerate(self.programs))
+        return '\n'.join(res)
+
+
+def random_operand(rng, ports):
+    # something to read from: a connected port, an unconnected one now and then, a constant, ACC or NIL
+    roll = rng.random()
+    if roll < 0.35 and ports:
+        return rng.choice(ports)
+    if roll < 0.4:
+        return rng.choice(PORTS)
+    if roll < 0.55:
+        return ACC
+    if roll < 0.6:
+        return NIL
+    if roll < 0.75:
+        return str(rng.choice([MAX_VALUE, -MAX_VALUE, 500, -500, 998]))
+    return str(rng.randint(-5, 5))
+
+
+def random_destination(rng, ports):
+    roll = rng.random()
+    if roll < 0.55 and ports:
+        return rng.choice(ports)
+    if roll < 0.6:
+        return rng.choice(PORTS)
+    if roll < 0.9:
+        return ACC
+    return NIL
+
+
+def random_program(rng, ports, length, first=(), last=()):
+    # program text with `length` random instructions, after the instructions
+    # in first and before the ones in last (lists of [opcode, operands...])
+    names = rng.sample(LABELS, rng.randint(0, 3))
+    # label -> instruction index, where length means after the last one
+    labels = dict((name, rng.randint(0, length)) for name in names)
+    instructions = []
+    for _ in range(length):
+        op = rng.choice([NOP, MOV, MOV, MOV, ADD, ADD, SUB, NEG, SWP, SAV, JMP, JEZ, JNZ, JLZ, JGZ, JRO, JRO])
+        if op in (JMP, JEZ, JNZ, JLZ, JGZ):
+            if not labels:
+                labels[rng.choice(LABELS)] = rng.randint(0, length)
+            operands = [rng.choice(sorted(labels))]
+        elif op == JRO:
+            operands = [rng.choice([ACC, NIL, str(rng.randint(-length - 1, length + 1))])]
+        elif op == MOV:
+            operands = [random_operand(rng, ports), random_destination(rng, ports)]
+        elif op in (ADD, SUB):
+            operands = [random_operand(rng, ports)]
+        else:
+            operands = []
+        instructions.append([op] + operands)
+    instructions = list(first) + instructions + list(last)
+    length = len(instructions)
+    labels = dict((name, min(idx, length)) for name, idx in labels.items())
+    lines = []
+    for idx in range(length + 1):
+        inline = []
+        for name in sorted(labels):
+            if labels[name] == idx:
+                if idx < length and not inline and rng.random() < 0.5:
+                    inline.append(name)
+                else:
+                    lines.append('{}:'.format(name))
+        if rng.random() < 0.1:
+            lines.append('# comment')
+        if idx == length:
+            break
+        op, operands = instructions[idx][0], instructions[idx][1:]
+        sep = ', ' if rng.random() < 0.8 else ' '
+        line = '{} {}'.format(op, sep.join(operands)).strip()
+        if rng.random() < 0.1:
+            line += '  # why not'
+        for name in inline:
+            line = '{}: {}'.format(name, line)
+        if rng.random() < 0.2:
+            line = line.upper()
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+def random_path(rng, neighbors, length, start=None):
+    # a random walk over the grid that never visits a node twice
+    path = [rng.randrange(len(neighbors)) if start is None else start]
+    while len(path) < length:
+        options = [j for j in neighbors[path[-1]].values() if j not in path]
+        if not options:
+            break
+        path.append(rng.choice(options))
+    return path
+
+
+def random_stage(rng, ports, source, destination):
+    # a program that passes values along a path: reads from source (None
+    # for the first node), works on them and writes them to destination
+    # (None for the last node), with some random instructions in between
+    first = []
+    last = []
+    if source and destination and rng.random() < 0.4:
+        # cascade
+        first.append([MOV, source, destination])
+    else:
+        if source:
+            first.append([MOV, source, ACC] if rng.random() < 0.6 else [rng.choice([ADD, SUB]), source])
+        if destination:
+            last.append([MOV, ACC, destination])
+    return random_program(rng, ports, rng.randint(0, 4), first, last)
+
+
+def random_ports(rng, topology):
+    # (inputs, outputs) of a board: a few ports on the edge of the grid
+    edges = [(i, port) for i in range(len(topology)) for port in PORTS if topology.on_edge(i, port)]
+    rng.shuffle(edges)
+    count = rng.randint(1, 2)
+    inputs = dict((key, [rng.choice([rng.randint(-5, 5), 500, MAX_VALUE, -MAX_VALUE])
+                         for _ in range(rng.randint(0, 6))])
+                  for key in edges[:count])
+    outputs = edges[count:count + rng.randint(1, 2)]
+    return inputs, outputs
+
+
+def random_board(rng, max_width=3, max_height=3):
+    width = rng.randint(1, max_width)
+    height = rng.randint(1, max_height)
+    topology = Topology(width, height)
+    neighbors = topology.neighbors
+    inputs, outputs = random_ports(rng, topology) if rng.random() < 0.5 else ({}, [])
+
+    def ports_of(i):
+        return [port for port in PORTS if port in neighbors[i] or (i, port) in inputs or (i, port) in outputs]
+    programs = []
+    for i in range(width * height):
+        if rng.random() < 0.15:
+            programs.append('')
+        else:
+            programs.append(random_program(rng, ports_of(i), rng.randint(1, 8)))
+    # Random programs mostly block on ports nobody writes to, so most
+    # boards also get a path of nodes that pass values along, from an
+    # input and to an output when there are some at its ends.
+    if rng.random() < 0.7:
+        start = rng.choice(sorted(inputs))[0] if inputs else None
+        path = random_path(rng, neighbors, rng.randint(2, width * height + 1), start)
+        for k, i in enumerate(path):
+            source = destination = None
+            if k > 0:
+                source = next(port for port, j in neighbors[i].items() if j == path[k - 1])
+            else:
+                source = next((port for node, port in sorted(inputs) if node == i), None)
+            if k < len(path) - 1:
+                destination = next(port for port, j in neighbors[i].items() if j == path[k + 1])
+            elif inputs:
+                # the end of the path gets an output, when it has a free port on the edge
+                free = [port for port in PORTS if topology.on_edge(i, port) and (i, port) not in inputs]
+                destination = next((port for node, port in outputs if node == i), None)
+                if destination is None and free:
+                    destination = rng.choice(free)
+                    outputs.append((i, destination))
+            programs[i] = random_stage(rng, ports_of(i), source, destination)
+    return Board(width, height, programs, inputs, outputs)
+
+
+class Source(AssemblyChip):
+    # the chip outside the grid that feeds an input: it writes its values
+    # one by one, then reads from a port that leads nowhere forever
+    def __init__(self, direction, values):
+        # direction: of the port on its node
+        lines = ['mov {}, {}'.format(value, reverse(direction)) for value in values]
+        AssemblyChip.__init__(self, '\n'.join(lines + ['mov {}, nil'.format(direction)]))
+
+
+class Sink(AssemblyChip):
+    # the chip outside the grid that takes an output, keeping every value it reads
+    def __init__(self, direction):
+        AssemblyChip.__init__(self, 'mov {}, nil'.format(reverse(direction)))
+        self.values = []
+
+    def read_done(self, value, destination):
+        self.values.append(value)
+        AssemblyChip.read_done(self, value, destination)
+
+
+def node_state(mode, line, acc, bak, port, value):
+    # what is compared for every node: the port only counts while it is
+    # blocked, and the value while it is writing
+    return (mode, line, acc, bak, port if mode != RUN else None, value if mode == WRITE else None)
+
+
+class Reference:
+    # AssemblyChip, connected up as a grid
+    name = 'reference'
+
+    def __init__(self, board):
+        self.chips = [AssemblyChip(program) for program in board.programs]
+        board.topology().connect(self.chips)
+        sources = []
+        for (node, direction), values in sorted(board.inputs.items()):
+            sources.append(Source(direction, values))
+            self.chips[node].connect(direction, sources[-1])
+        self.sinks = []
+        for node, direction in board.outputs:
+            self.sinks.append(Sink(direction))
+            self.chips[node].connect(direction, self.sinks[-1])
+        self.board = self.chips + sources + self.sinks
+
+    def step(self):
+        run_cycle(self.board)
+
+    def states(self):
+        return [node_state(chip.state, chip.pc, chip.acc, chip.bak, chip.port, chip.value)
+                for chip in self.chips] + [tuple(sink.values) for sink in self.sinks]
+
+
+class Fast:
+    name = 'engine'
+
+    def __init__(self, board):
+        self.engine = Engine(board.programs, board.topology(), board.inputs, board.outputs)
+        self.lines = [source_lines(program) for program in board.programs]
+        self.outputs = board.outputs
+        self.stepper = self.engine
+
+    def step(self):
+        self.stepper.step()
+
+    def states(self):
+        e = self.engine
+        return [node_state(e.mode[i], self.lines[i][e.pc[i]] if self.lines[i] else 0, e.acc[i], e.bak[i],
+                           e.port[i], e.value[i])
+                for i in range(len(e.programs))] + [tuple(e.outputs[key]) for key in self.outputs]
+
+
+class Partitioned(Fast):
+    name = 'partitioned'
+
+    def __init__(self, board):
+        Fast.__init__(self, board)
+        self.stepper = PartitionedEngine(self.engine, 2)
+
+    def step(self):
+        self.stepper.step()
+
+    def close(self):
+        self.stepper.close()
+
+
+ENGINES = [Fast, Partitioned]
+
+
+class Divergence:
+    def __init__(self, board, cycle, engine, expected, actual):
+        self.board = board
+        # first cycle where the engine disagreed with the reference, and
+        # their state of every node (see node_state()) and values written
+        # to every output after that cycle
+        self.cycle = cycle
+        self.engine = engine
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        res = ['{} disagrees with the reference after cycle {}'.format(self.engine, self.cycle)]
+        if isinstance(self.expected, str) or isinstance(self.actual, str):
+            # one of them failed with an error
+            res.append('  reference {}\n  {} {}'.format(self.expected, self.engine, self.actual))
+        else:
+            nodes = len(self.board.programs)
+            for i, (a, b) in enumerate(zip(self.expected, self.actual)):
+                if a != b:
+                    where = 'node {}'.format(i) if i < nodes else 'output {} {}'.format(*self.board.outputs[i - nodes])
+                    res.append('  {}: reference {}, {} {}'.format(where, a, self.engine, b))
+        res.append('{}x{} board:'.format(self.board.width, self.board.height))
+        res.append(str(self.board))
+        return '\n'.join(res)
+
+
+def compare(board, cycles=CYCLES, engines=None):
+    # Run board on the reference and every engine. Returns the first Divergence, or None.
+    engines = [engine(board) for engine in (engines or ENGINES)]
+    level = logger.LEVEL
+    logger.LEVEL = logger.INFO
+    try:
+        reference = Reference(board)
+        for cycle in range(1, cycles + 1):
+            try:
+                reference.step()
+                expected = reference.states()
+            except Exception as e:
+                expected = 'error: {}'.format(e)
+            for engine in engines:
+                try:
+                    engine.step()
+                    actual = engine.states()
+                except Exception as e:
+                    actual = 'error: {}'.format(e)
+                if actual != expected:
+                    return Divergence(board, cycle, engine.name, expected, actual)
+            if isinstance(expected, str):
+                return None
+        return None
+    finally:
+        logger.LEVEL = level
+        for engine in engines:
+            if hasattr(engine, 'close'):
+                engine.close()
+
+
+def _smaller(board):
+    # boards that are a bit simpler than board, simplest changes first
+    programs = board.programs
+    for i, program in enumerate(programs):
+        if program:
+            yield board.with_programs(programs[:i] + [''] + programs[i + 1:])
+    for i, program in enumerate(programs):
+        lines = program.splitlines()
+        for k in range(len(lines)):
+            shorter = '\n'.join(lines[:k] + lines[k + 1:])
+            yield board.with_programs(programs[:i] + [shorter] + programs[i + 1:])
+    for i, program in enumerate(programs):
+        lines = program.splitlines()
+        for k, line in enumerate(lines):
+            for simpler in _simpler_lines(line):
+                changed = '\n'.join(lines[:k] + [simpler] + lines[k + 1:])
+                yield board.with_programs(programs[:i] + [changed] + programs[i + 1:])
+
+
+def _simpler_lines(line):
+    # drop comments and case, and move constants towards 0
+    if '#' in line:
+        yield line[:line.index('#')].rstrip()
+    if line != line.lower():
+        yield line.lower()
+    tokens = line.replace(',', ' , ').split()
+    for k, token in enumerate(tokens):
+        try:
+            value = int(token)
+        except ValueError:
+            continue
+        for simpler in sorted(set([0, 1, value // 2]), key=abs):
+            if abs(simpler) < abs(value):
+                yield ' '.join(tokens[:k] + [str(simpler)] + tokens[k + 1:]).replace(' , ', ', ')
+
+
+def valid(board):
+    try:
+        for program in board.programs:
+            decode(program)
+    except Exception:
+        return False
+    return True
+
+
+def shrink(divergence, engines=None):
+    # keep making the board simpler for as long as it still disagrees
+    best = divergence
+    changed = True
+    while changed:
+        changed = False
+        for board in _smaller(best.board):
+            if not valid(board):
+                continue
+            found = compare(board, best.cycle, engines)
+            if found is not None:
+                best = found
+                changed = True
+                break
+    return best
+
+
+def fuzz(boards=100, cycles=CYCLES, seed=0, engines=None):
+    # shrunk Divergences for every board that found one
+    rng = random.Random(seed)
+    res = []
+    for _ in range(boards):
+        board = random_board(rng)
+        found = compare(board, cycles, engines)
+        if found is not None:
+            res.append(shrink(found, engines))
+    return res
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='compare every engine with AssemblyChip on random boards')
+    parser.add_argument('--boards', type=int, default=1000)
+    parser.add_argument('--cycles', type=int, default=CYCLES)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logger.LEVEL = logger.INFO
+    found = fuzz(args.boards, args.cycles, args.seed)
+    for divergence in found:
+        print(divergence)
+        print()
+    print('{} of {} boards disagreed'.format(len(found), args.boards))
@@ -0,0 +1,293 @@
+import json
+import os
+import random
+import time
+
+from .analysis import analyze
+from .engine import encode, JUMPS, MAX_INSTRUCTIONS
+from .grammar import Grammar
+from .incremental import IncrementalEvaluator
+from .logger import info
+from .memory import Store, profile
+from .puzzle import Result
+
+# Genetic algorithm over whole boards.
+#
+# A candidate is a tuple with one decoded program per node, so candidates are
+# hashable and evaluated at most once. Mutation, crossover, selection and
+# fitness are plain functions passed to GeneticAlgorithm, so they can be
+# swapped for other ones:
+#   mutation(candidate, rng, grammars) -> candidate
+#   crossover(a, b, rng) -> candidate
+#   selection(scored, rng) -> candidate, where scored is a list of
+#       (fitness, candidate) pairs sorted best first
+#   fitness(results) -> any value where bigger is better, from the
+#       puzzle.Result of every test set
+
+
+def default_fitness(results):
+    # Correct boards first, then fewest cycles, nodes and instructions,
+    # which is how the game ranks solutions. Wrong boards are ranked by how
+    # many outputs they got right, then by how many inputs they used.
+    expected = sum(result.expected for result in results)
+    correct = sum(result.correct for result in results)
+    if not all(result.passed for result in results):
+        read = sum(result.read for result in results)
+        return (False, correct / float(expected), read, 0, 0, 0)
+    cycles = sum(result.cycles for result in results) / float(len(results))
+    return (True, 1.0, 0, -cycles, -results[0].nodes, -results[0].instructions)
+
+
+def mutate_node(candidate, rng, grammars):
+    # mutate the program of a single node, mostly nodes already in use
+    # (grammars has None for disabled nodes, which are never touched)
+    used = [i for i, program in enumerate(candidate) if program]
+    if used and rng.random() < 0.8:
+        i = rng.choice(used)
+    else:
+        i = rng.choice([i for i, grammar in enumerate(grammars) if grammar is not None])
+    candidate = list(candidate)
+    if candidate[i] and rng.random() < 0.02:
+        candidate[i] = ()
+    else:
+        candidate[i] = grammars[i].mutate(candidate[i], rng)
+    return tuple(candidate)
+
+
+def uniform_crossover(a, b, rng):
+    # every node takes its program from either parent
+    return tuple(x if rng.random() < 0.5 else y for x, y in zip(a, b))
+
+
+def program_crossover(a, b, rng):
+    # one point crossover inside the program of a single node
+    i = rng.randrange(len(a))
+    x, y = a[i], b[i]
+    if not x or not y:
+        return uniform_crossover(a, b, rng)
+    cut_x = rng.randint(0, len(x))
+    cut_y = rng.randint(0, len(y))
+    program = list(x[:cut_x] + y[cut_y:])[:MAX_INSTRUCTIONS]
+    if not program:
+        return a
+    # jump targets in the tail of y move along with it
+    res = []
+    for idx, (op, t, c) in enumerate(program):
+        if op in JUMPS:
+            if idx >= cut_x:
+                t += cut_x - cut_y
+            t %= len(program)
+        res.append((op, t, c))
+    program = res
+    res = list(a)
+    res[i] = tuple(program)
+    return tuple(res)
+
+
+def mixed_crossover(a, b, rng):
+    if rng.random() < 0.5:
+        return uniform_crossover(a, b, rng)
+    return program_crossover(a, b, rng)
+
+
+def tournament(size=3):
+    def select(scored, rng):
+        return max(rng.sample(scored, min(size, len(scored))), key=lambda pair: pair[0])[1]
+    return select
+
+
+class GeneticAlgorithm:
+    def __init__(self, puzzle, population=100, elitism=2, mutation_rate=0.9, crossover_rate=0.5,
+                 test_sets=3, max_cycles=2000, patience=200, mutation=mutate_node, crossover=mixed_crossover,
+                 selection=tournament(), fitness=default_fitness, incremental=False, prune=False, memory=False, seed=0):
+        self.puzzle = puzzle
+        self.size = population
+        self.elitism = elitism
+        self.mutation_rate = mutation_rate
+        self.crossover_rate = crossover_rate
+        self.test_sets = [puzzle.test_set(n) for n in range(test_sets)]
+        self.max_cycles = max_cycles
+        self.patience = patience
+        # with incremental evaluation, children that differ from their parent
+        # in a single node only simulate the part of the run that changed
+        self.evaluators = None
+        if incremental:
+            self.evaluators = [IncrementalEvaluator(puzzle, test_set, max_cycles, patience)
+                               for test_set in self.test_sets]
+        self.parents = {}
+        # with pruning, boards that static analysis shows can't pass are
+        # given the worst score without simulating them
+        self.prune = prune
+        self.rejected = 0
+        # with memory, status() also reports the bytes used by the population
+        self.memory = memory
+        # one shared copy of every program in the population
+        self.store = Store()
+        self.mutation = mutation
+        self.crossover = crossover
+        self.selection = selection
+        self.fitness = fitness
+        self.rng = random.Random(seed)
+        nodes = puzzle.width * puzzle.height
+        self.grammars = [Grammar(puzzle.connected_ports(i), puzzle.connected_ports(i), (1, -1))
+                         if i not in puzzle.topology.disabled else None for i in range(nodes)]
+        self.population = [self.random_candidate() for _ in range(population)]
+        self.generation = 0
+        self.evaluations = 0
+        self.elapsed = 0.0
+        self.cache = {}
+
+    def random_candidate(self):
+        # an empty board with a few random mutations
+        candidate = tuple(() for _ in self.grammars)
+        for _ in range(self.rng.randint(1, 5)):
+            candidate = self.mutation(candidate, self.rng, self.grammars)
+        return self.store.candidate(candidate)
+
+    def evaluate(self, candidate):
+        if candidate not in self.cache:
+            self.evaluations += 1
+            if self.prune and analyze(self.puzzle, candidate).impossible():
+                self.rejected += 1
+                results = [self.rejected_result(candidate, test_set) for test_set in self.test_sets]
+            elif self.evaluators:
+                parent = self.parents.get(candidate)
+                results = [evaluator.evaluate(candidate, parent).result for evaluator in self.evaluators]
+            else:
+                results = [self.puzzle.evaluate(candidate, test_set, self.max_cycles, self.patience)
+                           for test_set in self.test_sets]
+            self.cache[candidate] = (self.fitness(results), results)
+        return self.cache[candidate][0]
+
+    def rejected_result(self, candidate, test_set):
+        # the result of a board that can't pass, without running it
+        nodes = sum(1 for program in candidate if program)
+        instructions = sum(len(program) for program in candidate)
+        return Result(False, 0, test_set.expected(), 0, nodes, instructions)
+
+    def scored(self):
+        # (fitness, candidate) pairs, best first
+        return sorted(((self.evaluate(c), c) for c in self.population), key=lambda pair: pair[0], reverse=True)
+
+    def best(self):
+        return self.scored()[0]
+
+    def step(self):
+        start = time.time()
+        scored = self.scored()
+        population = [candidate for _, candidate in scored[:self.elitism]]
+        parents = {}
+        while len(population) < self.size:
+            parent = child = self.selection(scored, self.rng)
+            if self.rng.random() < self.crossover_rate:
+                child = self.crossover(child, self.selection(scored, self.rng), self.rng)
+                parent = None
+            if self.rng.random() < self.mutation_rate or child in population:
+                child = self.mutation(child, self.rng, self.grammars)
+                if parent is not None:
+                    parents[child] = parent
+            population.append(self.store.candidate(child))
+        self.population = population
+        self.store.keep(population)
+        self.parents = parents
+        self.generation += 1
+        # only keep the fitness of the current population
+        self.cache = dict((c, self.cache[c]) for c in population if c in self.cache)
+        self.elapsed += time.time() - start
+
+    def generations_per_second(self):
+        return self.generation / self.elapsed if self.elapsed else 0.0
+
+    def run(self, generations, checkpoint=None, every=10, report=10):
+        for _ in range(generations):
+            self.step()
+            if report and self.generation % report == 0:
+                info(self.status())
+            if checkpoint and self.generation % every == 0:
+                self.save(checkpoint)
+        if checkpoint:
+            self.save(checkpoint)
+        return self.best()
+
+    def status(self):
+        fitness, _ = self.best()
+        res = 'generation {}: best {}, {:.2f} generations/s, {} evaluations'.format(
+            self.generation, fitness, self.generations_per_second(), self.evaluations)
+        if self.evaluators:
+            simulated = sum(evaluator.simulated for evaluator in self.evaluators)
+            saved = sum(evaluator.saved for evaluator in self.evaluators)
+            res += ', {} cycles simulated, {} saved'.format(simulated, saved)
+        if self.prune:
+            res += ', {} rejected without simulating'.format(self.rejected)
+        if self.memory:
+            memory = self.profile()
+            res += ', {:.0f} bytes per candidate, {:.0f} per node'.format(memory.per_candidate(), memory.per_node())
+        return res
+
+    def profile(self):
+        # memory.Profile of the population
+        return profile(self.population)
+
+    def save(self, path):
+        # Write the population as program text, so checkpoints can be read
+        # and edited. The file is replaced atomically, so a run that is killed
+        # while saving still leaves the previous checkpoint behind.
+        state = {
+            'generation': self.generation,
+            'evaluations': self.evaluations,
+            'elapsed': self.elapsed,
+            'rng': self.rng.getstate(),
+            'population': [[encode(program) for program in candidate] for candidate in self.population],
+        }
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def load(self, path):
+        with open(path) as f:
+            state = json.load(f)
+        self.generation = state['generation']
+        self.evaluations = state['evaluations']
+        self.elapsed = state['elapsed']
+        version, internal, gauss = state['rng']
+        self.rng.setstate((version, tuple(internal), gauss))
+        self.population = [tuple(self.store.decode(program) for program in candidate)
+                           for candidate in state['population']]
+        self.store.keep(self.population)
+        self.cache = {}
+
+    @classmethod
+    def resume(cls, puzzle, path, **kwargs):
+        # continue a run from a checkpoint, or start a new one if there is none
+        ga = cls(puzzle, **kwargs)
+        if os.path.exists(path):
+            ga.load(path)
+        return ga
+
+
+if __name__ == '__main__':
+    import argparse
+    from .puzzle import get_puzzle
+    parser = argparse.ArgumentParser(description='evolve a solution to a puzzle')
+    parser.add_argument('puzzle', help='puzzle id')
+    parser.add_argument('--generations', type=int, default=100)
+    parser.add_argument('--population', type=int, default=100)
+    parser.add_argument('--checkpoint', help='file to save the population to and resume from')
+    parser.add_argument('--incremental', action='store_true', help='only re-simulate what a mutation changed')
+    parser.add_argument('--prune', action='store_true', help="don't simulate boards that can't pass")
+    parser.add_argument('--memory', action='store_true', help='report the memory used by the population')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    puzzle = get_puzzle(args.puzzle)
+    options = dict(population=args.population, incremental=args.incremental, prune=args.prune,
+                   memory=args.memory, seed=args.seed)
+    if args.checkpoint:
+        ga = GeneticAlgorithm.resume(puzzle, args.checkpoint, **options)
+    else:
+        ga = GeneticAlgorithm(puzzle, **options)
+    fitness, candidate = ga.run(args.generations, args.checkpoint)
+    print(ga.status())
+    for i, program in enumerate(candidate):
+        if program:
+            print('@{}\n{}\n'.format(i, encode(program)))
@@ -0,0 +1,143 @@
+from .assembly import ACC, NIL, NOP, MOV, ADD, SUB, NEG, SWP, SAV, JMP, JRO
+from .engine import PORTS, JUMPS, MAX_INSTRUCTIONS
+
+# Which decoded instructions make sense for a node, and random edits of
+# decoded programs that stay inside the instruction grammar and the
+# 15 instruction limit. Used by the superoptimizer and the genetic algorithm.
+
+
+class Grammar:
+    def __init__(self, reads=PORTS, writes=PORTS, constants=(1, -1), max_length=MAX_INSTRUCTIONS, jro=True):
+        # reads/writes: ports this node may read from or write to
+        # constants: literal values worth trying
+        self.reads = tuple(reads)
+        self.writes = tuple(writes)
+        self.constants = tuple(sorted(set(constants)))
+        self.max_length = max_length
+        self.jro = jro
+        self._instructions = {}
+
+    def sources(self):
+        return self.constants + (ACC, NIL) + self.reads
+
+    def instructions(self, length):
+        # every useful instruction for a program of the given length.
+        # Instructions that can never change anything (nop, add 0, mov acc, acc,
+        # mov <constant>, nil) are left out.
+        if length not in self._instructions:
+            self._instructions[length] = tuple(self._build(length))
+        return self._instructions[length]
+
+    def _build(self, length):
+        res = [(NEG, None, None), (SAV, None, None), (SWP, None, None)]
+        for src in self.sources():
+            for dst in (ACC, NIL) + self.writes:
+                if src == dst or (dst == NIL and src not in self.reads):
+                    continue
+                res.append((MOV, src, dst))
+            if src not in (0, NIL):
+                res.append((ADD, src, None))
+                if src != ACC:
+                    res.append((SUB, src, None))
+        for target in range(length):
+            for op in JUMPS:
+                res.append((op, target, None))
+        if self.jro and length > 2:
+            res.append((JRO, ACC, None))
+            for offset in range(-length + 1, length):
+                if offset not in (0, 1):
+                    res.append((JRO, offset, None))
+        return res
+
+    def random_instruction(self, rng, length):
+        return rng.choice(self.instructions(length))
+
+    def mutate(self, program, rng):
+        # one random edit: replace, insert, delete or swap instructions,
+        # or change a single operand. Jump targets are kept pointing at the
+        # same instruction where possible.
+        program = list(program)
+        choices = ['replace', 'operand']
+        if len(program) < self.max_length:
+            choices.append('insert')
+        if len(program) > 1:
+            choices += ['delete', 'swap']
+        if not program:
+            choices = ['insert']
+        kind = rng.choice(choices)
+        if kind == 'insert':
+            idx = rng.randrange(len(program) + 1)
+            program = retarget(program, idx, 1)
+            program.insert(idx, self.random_instruction(rng, len(program) + 1))
+        elif kind == 'delete':
+            idx = rng.randrange(len(program))
+            del program[idx]
+            program = retarget(program, idx, -1)
+        elif kind == 'swap':
+            i, j = rng.sample(range(len(program)), 2)
+            program[i], program[j] = program[j], program[i]
+        elif kind == 'replace':
+            idx = rng.randrange(len(program))
+            program[idx] = self.random_instruction(rng, len(program))
+        else:
+            idx = rng.randrange(len(program))
+            program[idx] = self.mutate_operand(program[idx], rng, len(program))
+        return tuple(program)
+
+    def mutate_operand(self, instruction, rng, length):
+        op, a, b = instruction
+        if op in JUMPS:
+            return (rng.choice(JUMPS), rng.randrange(length), None)
+        if op == MOV:
+            if rng.random() < 0.5:
+                return (MOV, rng.choice(self.sources()), b)
+            return (MOV, a, rng.choice((ACC, NIL) + self.writes))
+        if op in (ADD, SUB):
+            return (rng.choice((ADD, SUB)), rng.choice(self.sources()), None)
+        if op == JRO:
+            return (JRO, rng.choice((ACC,) + tuple(range(-length + 1, length))), None)
+        return (rng.choice((NEG, SAV, SWP)), None, None)
+
+
+def retarget(program, idx, delta):
+    # fix jump targets after inserting (delta=1) or deleting (delta=-1)
+    # an instruction at idx. program already has its new length when deleting.
+    length = len(program) + (1 if delta > 0 else 0)
+    res = []
+    for op, a, b in program:
+        if op in JUMPS:
+            if a > idx or (delta > 0 and a == idx):
+                a += delta
+            # a jump past the last instruction wraps around to the first one
+            if length:
+                a %= length
+        res.append((op, a, b))
+    return res
+
+
+def useless(program):
+    # number of instructions that make the program equivalent to a shorter one
+    targets = set(a for op, a, _ in program if op in JUMPS)
+    count = 0
+    for i, (op, a, b) in enumerate(program):
+        if op == NOP:
+            count += 1
+            continue
+        if op == JMP and a == (i + 1) % len(program):
+            count += 1
+            continue
+        if i + 1 == len(program) or (i + 1) in targets:
+            continue
+        nxt = program[i + 1][0]
+        # neg neg, swp swp and sav sav do nothing more than a single sav
+        if op == nxt and op in (NEG, SWP, SAV):
+            count += 1
+        # code right after an unconditional jump that nothing jumps to is dead
+        elif op == JMP:
+            count += 1
+    return count
+
+
+def is_useful(program):
+    # cheap filter for programs that are equivalent to a shorter program
+    return useless(program) == 0
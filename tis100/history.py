@@ -0,0 +1,161 @@
+from collections import deque
+
+from .assembly import WRITE
+
+# Undo history of an engine, so it can be stepped backwards.
+#
+# Every cycle only a few things change, so instead of snapshots the history
+# keeps, for every cycle, what changed and what it was before: a flat tuple
+# of (field, key, old value) triples. Fields 0-7 are the per-node lists
+# (key is a node), then come the input positions and the output lengths
+# (key is the port). Cycles are kept in a ring buffer holding at most
+# `limit` entries (a cycle counts as one entry, plus one per change), so
+# the oldest cycles are forgotten and memory stays bounded however long
+# the run is. An entry takes about 40 bytes.
+#
+# Stepping forward again after stepping back simulates the cycles again,
+# which gives the same result.
+
+FIELDS = ('acc', 'bak', 'pc', 'mode', 'port', 'value', 'dst', 'issued')
+POSITION = len(FIELDS)
+OUTPUT = POSITION + 1
+MODE = FIELDS.index('mode')
+PORT = FIELDS.index('port')
+LIMIT = 1000000
+
+# comparisons for watchpoints
+COMPARE = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+class History:
+    def __init__(self, engine, limit=LIMIT):
+        self.engine = engine
+        self.limit = limit
+        # one tuple of changes per cycle, oldest first
+        self.deltas = deque()
+        # entries in self.deltas: one per cycle and one per change
+        self.size = 0
+        self._state = self._copy()
+
+    def _copy(self):
+        engine = self.engine
+        return ([getattr(engine, name)[:] for name in FIELDS], dict(engine.position),
+                dict((port, len(values)) for port, values in engine.outputs.items()))
+
+    def step(self):
+        # step the engine and record what changed
+        engine = self.engine
+        active = engine.step()
+        lists, position, lengths = self._state
+        delta = []
+        for field, name in enumerate(FIELDS):
+            before = lists[field]
+            after = getattr(engine, name)
+            if before != after:
+                for i, old in enumerate(before):
+                    if old != after[i]:
+                        delta.extend((field, i, old))
+                        before[i] = after[i]
+        if position != engine.position:
+            for key, old in position.items():
+                if engine.position[key] != old:
+                    delta.extend((POSITION, key, old))
+                    position[key] = engine.position[key]
+        for key, old in lengths.items():
+            if len(engine.outputs[key]) != old:
+                delta.extend((OUTPUT, key, old))
+                lengths[key] = len(engine.outputs[key])
+        delta = tuple(delta)
+        self.deltas.append(delta)
+        self.size += len(delta) // 3 + 1
+        while self.size > self.limit and self.deltas:
+            self.size -= len(self.deltas.popleft()) // 3 + 1
+        return active
+
+    def cycles(self):
+        # how many cycles can be undone
+        return len(self.deltas)
+
+    def back(self):
+        # undo the last cycle, returns False when there is nothing left to undo
+        if not self.deltas:
+            return False
+        delta = self.deltas.pop()
+        self.size -= len(delta) // 3 + 1
+        engine = self.engine
+        lists, position, lengths = self._state
+        for k in range(0, len(delta), 3):
+            field, key, old = delta[k:k + 3]
+            if field == POSITION:
+                engine.position[key] = position[key] = old
+            elif field == OUTPUT:
+                engine.written -= len(engine.outputs[key]) - old
+                del engine.outputs[key][old:]
+                lengths[key] = old
+            else:
+                getattr(engine, FIELDS[field])[key] = lists[field][key] = old
+        engine.cycle -= 1
+        return True
+
+    def last_write(self, node, port):
+        # how many cycles ago node last finished writing to port (1 for the
+        # last cycle), None when that isn't in the history
+        # nothing is undone: the port of node is followed back through the deltas
+        current = self.engine.port[node]
+        for ago, delta in enumerate(reversed(self.deltas), 1):
+            finished = False
+            before = current
+            for k in range(0, len(delta), 3):
+                if delta[k + 1] != node:
+                    continue
+                if delta[k] == MODE and delta[k + 2] == WRITE:
+                    finished = True
+                elif delta[k] == PORT:
+                    before = delta[k + 2]
+            if finished and current == port:
+                return ago
+            current = before
+        return None
+
+    def back_to_write(self, node, port):
+        # Step back to just before node last finished writing to port.
+        # Returns False, without going back at all, when that isn't in the history.
+        ago = self.last_write(node, port)
+        if ago is None:
+            return False
+        for _ in range(ago):
+            self.back()
+        return True
+
+    def memory(self):
+        # rough size of the history in bytes
+        return self.size * 40
+
+
+class Watchpoint:
+    # stops when ACC of a node changes, or starts to compare to a value
+    def __init__(self, node, op=None, value=None):
+        if op is not None and op not in COMPARE:
+            raise Exception('unknown comparison {}'.format(op))
+        self.node = node
+        self.op = op
+        self.value = value
+
+    def hit(self, before, after):
+        # before and after: ACC of the node before and after a cycle
+        if self.op is None:
+            return before != after
+        compare = COMPARE[self.op]
+        return compare(after, self.value) and not compare(before, self.value)
+
+    def __str__(self):
+        if self.op is None:
+            return 'acc of node {} changes'.format(self.node)
+        return 'acc of node {} {} {}'.format(self.node, self.op, self.value)
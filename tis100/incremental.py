@@ -0,0 +1,236 @@
+from collections import OrderedDict
+
+from .assembly import RUN, READ, WRITE, NIL, NOP, reverse
+from .engine import Engine, PORTS
+from .puzzle import MAX_CYCLES
+
+# Incremental re-evaluation of single-node mutations.
+#
+# Nodes only see each other through their ports, and a neighbor only cares
+# whether a node is running, or reading/writing which port (and which value).
+# While a board is evaluated the first time we record that visible state for
+# every node after every cycle, plus a full snapshot every `interval` cycles.
+#
+# When one node gets a new program, that node is replayed on its own, with
+# its neighbors played back from the recording. As long as its visible state
+# is the same as before, the rest of the board is too. From the first cycle
+# where it differs, the whole board is simulated again, starting from the
+# last snapshot before that cycle with the replayed state of the mutated node.
+# The result is exactly the same as evaluating the mutated board from scratch.
+
+INTERVAL = 16
+
+
+def visible(state):
+    # what the neighbors of a node can see of its (mode, port, value)
+    mode = state[0]
+    if mode == RUN:
+        return (RUN,)
+    if mode == WRITE:
+        return state
+    return (mode, state[1])
+
+
+class Recording:
+    def __init__(self, programs, test_set, interval=INTERVAL):
+        self.programs = programs
+        self.test_set = test_set
+        self.interval = interval
+        # mode, port and value lists of the engine after every cycle, starting at cycle 0
+        self.modes = []
+        self.ports = []
+        self.values = []
+        # cycle -> (engine snapshot, cycle of the last output so far)
+        self.snapshots = {}
+        self.outputs = None
+        self.result = None
+
+    def state(self, cycle, i):
+        return (self.modes[cycle][i], self.ports[cycle][i], self.values[cycle][i])
+
+    def cycles(self):
+        # the last recorded cycle, which is where the run stopped
+        return len(self.modes) - 1
+
+    def record(self, engine, last):
+        self.modes.append(engine.mode[:])
+        self.ports.append(engine.port[:])
+        self.values.append(engine.value[:])
+        if engine.cycle % self.interval == 0:
+            self.snapshots[engine.cycle] = (engine.snapshot(), last)
+
+
+class Evaluation:
+    def __init__(self, result, cycles, saved):
+        self.result = result
+        # board cycles simulated, and board cycles skipped thanks to the recording
+        self.cycles = cycles
+        self.saved = saved
+
+
+class IncrementalEvaluator:
+    def __init__(self, puzzle, test_set, max_cycles=MAX_CYCLES, patience=None, interval=INTERVAL, size=256):
+        self.puzzle = puzzle
+        self.test_set = test_set
+        self.max_cycles = max_cycles
+        self.patience = patience
+        self.interval = interval
+        # recordings of the most recently evaluated candidates
+        self.size = size
+        self.recordings = OrderedDict()
+        self.simulated = 0
+        self.saved = 0
+
+    def evaluate(self, programs, parent=None):
+        # Evaluate programs (a tuple of decoded programs). When parent was
+        # evaluated before and differs in a single node, only the part of the
+        # run that changed is simulated again.
+        if programs in self.recordings:
+            self.recordings.move_to_end(programs)
+            return Evaluation(self.recordings[programs].result, 0, 0)
+        changed = None
+        if parent in self.recordings:
+            diff = [i for i, (a, b) in enumerate(zip(parent, programs)) if a != b]
+            if len(diff) == 1:
+                changed = diff[0]
+        if changed is None:
+            return self._full(programs)
+        return self._mutated(self.recordings[parent], changed, programs)
+
+    def _keep(self, recording):
+        self.recordings[recording.programs] = recording
+        while len(self.recordings) > self.size:
+            self.recordings.popitem(last=False)
+
+    def _run(self, recording, engine, last):
+        start = engine.cycle
+        result = self.puzzle.run(engine, self.test_set, self.max_cycles, self.patience, last, recording.record)
+        recording.outputs = dict((port, values[:]) for port, values in engine.outputs.items())
+        recording.result = result
+        self._keep(recording)
+        self.simulated += engine.cycle - start
+        self.saved += start
+        return Evaluation(result, engine.cycle - start, start)
+
+    def _full(self, programs):
+        recording = Recording(programs, self.test_set, self.interval)
+        engine = self.puzzle.engine(programs, self.test_set)
+        recording.record(engine, 0)
+        return self._run(recording, engine, 0)
+
+    def _mutated(self, base, node, programs):
+        program = programs[node]
+        if bool(program) != bool(base.programs[node]):
+            # an empty node never runs, so it can't be told apart from a node
+            # that runs without using its ports
+            return self._full(programs)
+        states, diverged = self._replay(base, node, program)
+        end = base.cycles()
+        recording = Recording(programs, self.test_set, self.interval)
+        recording.snapshots = dict((cycle, (self._patch(base.snapshots[cycle][0], node, states[cycle]),
+                                            base.snapshots[cycle][1])) for cycle in states)
+        if diverged is None:
+            # the new program looks exactly the same to the rest of the board
+            # for the whole run, so the run ends the same way
+            result = base.result
+            instructions = result.instructions - len(base.programs[node]) + len(program)
+            recording.result = type(result)(result.passed, result.correct, result.expected, result.cycles,
+                                            result.nodes, instructions, result.read)
+            # nothing is appended to a finished recording, so they can share lists
+            recording.modes, recording.ports, recording.values = base.modes, base.ports, base.values
+            recording.outputs = base.outputs
+            self._keep(recording)
+            self.saved += end
+            return Evaluation(recording.result, 0, end)
+        # restart the whole board from the last snapshot before things changed
+        start = max(states)
+        snapshot, last = recording.snapshots[start]
+        engine = self.puzzle.engine(programs, self.test_set)
+        engine.restore(snapshot)
+        for port, length in snapshot[-1].items():
+            engine.outputs[port][:] = base.outputs[port][:length]
+        recording.modes, recording.ports, recording.values = \
+            base.modes[:start], base.ports[:start], base.values[:start]
+        recording.record(engine, last)
+        return self._run(recording, engine, last)
+
+    def _patch(self, snapshot, node, state):
+        # a snapshot of the base run with the mutated node in its new state
+        node_state, position = state
+        snapshot = list(snapshot)
+        for k, value in enumerate(node_state):
+            snapshot[k + 1] = snapshot[k + 1][:]
+            snapshot[k + 1][node] = value
+        # the replay engine numbers the mutated node 0
+        snapshot[9] = dict(snapshot[9])
+        for (_, port), n in position.items():
+            snapshot[9][(node, port)] = n
+        return tuple(snapshot)
+
+    def _replay(self, base, node, program):
+        # Replay the mutated node against the recorded neighbors. Returns the
+        # state of the node at every snapshot cycle up to where it diverged,
+        # and that cycle (None when it never does).
+        neighbors = self.puzzle.neighbors[node]
+        puppets = dict((port, k + 1) for k, port in enumerate(neighbors))
+        links = [puppets] + [{reverse(port): 0} for port in neighbors]
+        inputs = dict(((0, port), values) for (i, port), values in
+                      zip(self.puzzle.input_ports(), self.test_set.inputs) if i == node)
+        outputs = [(0, port) for i, port in self.puzzle.output_ports() if i == node]
+        replay = Engine([program] + [((NOP, None, None),)] * len(neighbors), links, inputs, outputs)
+        for k in puppets.values():
+            self._idle(replay, k)
+        # cycles of the base run that were recorded (the last one is where it stopped)
+        modes, ports, values = base.modes, base.ports, base.values
+        end = base.cycles()
+        snapshots = base.snapshots
+        res = {0: (replay.node_state(0), dict(replay.position))}
+        cycle = 0
+        while cycle < end:
+            mode, port = replay.mode[0], replay.port[0]
+            if mode != RUN and port in puppets:
+                # Blocked on a neighbor, which is the only thing that can
+                # change that, so skip ahead to the first cycle where the
+                # recorded neighbor is ready for the transfer.
+                j = neighbors[port]
+                k = puppets[port]
+                mine = visible((mode, port, replay.value[0]))
+                wanted = (WRITE if mode == READ else READ, reverse(port))
+                cycle += 1
+                while cycle <= end:
+                    partner = (modes[cycle - 1][j], ports[cycle - 1][j], values[cycle - 1][j])
+                    if partner[:2] == wanted:
+                        break
+                    if visible(base.state(cycle, node)) != mine:
+                        return res, cycle
+                    if cycle in snapshots:
+                        res[cycle] = (replay.node_state(0), dict(replay.position))
+                    cycle += 1
+                if cycle > end:
+                    break
+                replay.mode[k], replay.port[k], replay.value[k] = partner
+                replay.issued[k] = cycle - 1
+                replay.cycle = cycle - 1
+                replay.step()
+                self._idle(replay, k)
+            else:
+                replay.cycle = cycle
+                replay.step()
+                cycle += 1
+            if cycle in snapshots:
+                res[cycle] = (replay.node_state(0), dict(replay.position))
+            if visible((replay.mode[0], replay.port[0], replay.value[0])) != visible(base.state(cycle, node)):
+                return res, cycle
+        return res, None
+
+    def _idle(self, engine, k):
+        # a puppet reading from a port that leads nowhere never does anything
+        engine.mode[k] = READ
+        engine.port[k] = next(port for port in PORTS if port not in engine.neighbors[k])
+        engine.dst[k] = NIL
+
+    def report(self):
+        total = self.simulated + self.saved
+        return '{} board cycles simulated, {} saved ({:.0%})'.format(
+            self.simulated, self.saved, self.saved / float(total) if total else 0.0)
+
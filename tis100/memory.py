@@ -0,0 +1,122 @@
+import sys
+from collections import deque
+
+from .engine import decode
+
+# Memory use of populations.
+#
+# deep_size() adds up sys.getsizeof() of an object and of everything it
+# refers to, counting objects that are shared only once, so it measures
+# what a whole population really takes. profile() reports that per
+# candidate and per node.
+#
+# Candidates of a population share most of their programs (a child only
+# differs from its parent in a node or two), but programs that are decoded
+# or built again are new objects, even when they are equal to existing
+# ones. A Store keeps one copy of every instruction, program and program
+# text, and hands out that copy instead, so identical programs are stored
+# once however many candidates use them. GeneticAlgorithm puts every
+# candidate through its store, and only keeps what the current population
+# uses (see Store.keep).
+#
+#   python -m tis100.genetic PUZZLE --memory
+# reports the bytes per candidate and per node as it goes.
+
+# containers whose items are followed by deep_size()
+CONTAINERS = (list, tuple, set, frozenset, deque)
+
+
+def deep_size(obj, seen=None):
+    # Bytes used by obj and everything it refers to. Objects already in
+    # seen (a set of ids) aren't counted again, so passing the same set to
+    # several calls counts what they share once.
+    if seen is None:
+        seen = set()
+    size = 0
+    todo = [obj]
+    while todo:
+        obj = todo.pop()
+        if id(obj) in seen or isinstance(obj, type):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            todo.extend(obj.keys())
+            todo.extend(obj.values())
+        elif isinstance(obj, CONTAINERS):
+            todo.extend(obj)
+        elif hasattr(obj, '__dict__'):
+            todo.append(obj.__dict__)
+    return size
+
+
+class Profile:
+    def __init__(self, total, candidates, nodes):
+        self.total = total
+        self.candidates = candidates
+        self.nodes = nodes
+
+    def per_candidate(self):
+        return self.total / float(self.candidates) if self.candidates else 0.0
+
+    def per_node(self):
+        return self.total / float(self.candidates * self.nodes) if self.candidates and self.nodes else 0.0
+
+    def __str__(self):
+        return '{} candidates: {} bytes, {:.0f} per candidate, {:.0f} per node'.format(
+            self.candidates, self.total, self.per_candidate(), self.per_node())
+
+
+def profile(population, nodes=None):
+    # population: a list of candidates, each of them anything with one item per node
+    if nodes is None:
+        nodes = len(population[0]) if population else 0
+    return Profile(deep_size(population), len(population), nodes)
+
+
+class Store:
+    # one shared copy of every instruction, decoded program and program text
+    def __init__(self):
+        self.instructions = {}
+        self.programs = {}
+        # program text -> decoded program
+        self.texts = {}
+        self.hits = 0
+        self.misses = 0
+
+    def instruction(self, instruction):
+        return self.instructions.setdefault(instruction, instruction)
+
+    def program(self, program):
+        res = self.programs.get(program)
+        if res is None:
+            self.misses += 1
+            res = tuple(self.instruction(instruction) for instruction in program)
+            self.programs[res] = res
+        else:
+            self.hits += 1
+        return res
+
+    def candidate(self, candidate):
+        return tuple(self.program(program) for program in candidate)
+
+    def text(self, text):
+        return sys.intern(text)
+
+    def decode(self, text):
+        # decoded program of text, only decoding each text once
+        res = self.texts.get(text)
+        if res is None:
+            res = self.texts[self.text(text)] = self.program(decode(text))
+        return res
+
+    def keep(self, candidates):
+        # forget everything the candidates don't use
+        self.programs = dict((program, program) for candidate in candidates for program in candidate)
+        self.instructions = dict((instruction, instruction)
+                                 for program in self.programs for instruction in program)
+        self.texts = dict((text, program) for text, program in self.texts.items() if program in self.programs)
+
+    def __len__(self):
+        return len(self.programs)
+
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Stepping boards with several threads.
+#
+# Engine.step() is split into execute(), transfers() and commit() (see
+# engine.py). In execute() a node only changes its own state, and
+# transfers() only looks at the state execute() left behind, so both can run
+# on separate parts of a board at the same time. commit() is cheap and runs
+# on the calling thread, so the result is exactly the same as Engine.step(),
+# whatever the number of threads or the order they finish in.
+#
+# With the GIL, threads take turns and this is only slower than a plain
+# Engine. On a free-threaded build (python3.13t and later) they really run
+# at the same time. A ThreadPoolExecutor can be passed in, but no other
+# executor: worker processes would step pickled copies of the engine, and
+# every change would be lost. benchmarks/parallel.py measures how well this
+# scales.
+#
+# evaluate_all() has no such problem, as every task returns its result, so
+# it takes any concurrent.futures executor, processes included.
+
+
+def partition(count, parts):
+    # split range(count) into at most `parts` contiguous ranges of about the same size
+    parts = max(1, min(parts, count))
+    size, extra = divmod(count, parts)
+    res = []
+    start = 0
+    for k in range(parts):
+        end = start + size + (1 if k < extra else 0)
+        res.append(range(start, end))
+        start = end
+    return res
+
+
+class PartitionedEngine:
+    def __init__(self, engine, workers=2, executor=None):
+        # steps engine with its nodes split between `workers` threads
+        self.engine = engine
+        if executor is not None and not isinstance(executor, ThreadPoolExecutor):
+            raise Exception('nodes can only be stepped by threads, not by a {}'.format(type(executor).__name__))
+        self.partitions = partition(len(engine.programs), workers)
+        self.executor = executor or ThreadPoolExecutor(len(self.partitions))
+        self.owned = executor is None
+
+    def step(self):
+        engine = self.engine
+        engine.cycle += 1
+        # every part has to finish execute() before any transfers() start
+        active = any(list(self.executor.map(engine.execute, self.partitions)))
+        transfers = []
+        for part in self.executor.map(engine.transfers, self.partitions):
+            transfers.extend(part)
+        return engine.commit(transfers) or active
+
+    def run(self, cycles):
+        for _ in range(cycles):
+            self.step()
+
+    def close(self):
+        if self.owned:
+            self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def evaluate_board(puzzle, test_set, programs, **kwargs):
+    # one task of evaluate_all(), at module level so worker processes can run it
+    return puzzle.evaluate(programs, test_set, **kwargs)
+
+
+def evaluate_all(puzzle, boards, test_set, workers=2, executor=None, **kwargs):
+    # Evaluate many boards on the same test set, one board per task.
+    # Returns their puzzle.Result in the same order as boards.
+    evaluate = partial(evaluate_board, puzzle, test_set, **kwargs)
+    if executor is not None:
+        return list(executor.map(evaluate, boards))
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(evaluate, boards))
@@ -0,0 +1,223 @@
+from .assembly import UP, DOWN
+from .engine import Engine, decode, encode
+from .topology import Topology
+
+# Puzzles: a grid of nodes with input streams coming in at the top edge and
+# output streams leaving at the bottom edge, and maybe some disabled nodes
+# (see topology.py). Each puzzle can create any number of random test sets
+# (input values and the expected output values).
+
+WIDTH = 4
+HEIGHT = 3
+TEST_LENGTH = 39
+MAX_CYCLES = 10000
+
+
+def grid_neighbors(width=WIDTH, height=HEIGHT):
+    # one {direction: node} dict per node, numbered row by row from the top left
+    return Topology(width, height).neighbors
+
+
+class TestSet:
+    def __init__(self, inputs, outputs):
+        # one list of values per input/output stream of the puzzle
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def expected(self):
+        return sum(len(values) for values in self.outputs)
+
+
+class Result:
+    def __init__(self, passed, correct, expected, cycles, nodes, instructions, read=0):
+        self.passed = passed
+        # output values that matched, counting each stream up to its first wrong value
+        self.correct = correct
+        self.expected = expected
+        # cycle in which the last output value was written, so it includes
+        # the cycles values take to drain through the board after the last
+        # input is read
+        self.cycles = cycles
+        self.nodes = nodes
+        self.instructions = instructions
+        # input values consumed
+        self.read = read
+
+    def __str__(self):
+        return '{}: {}/{} outputs, {} cycles, {} nodes, {} instructions'.format(
+            'PASSED' if self.passed else 'FAILED', self.correct, self.expected,
+            self.cycles, self.nodes, self.instructions)
+
+
+class Puzzle:
+    def __init__(self, id, name, inputs, outputs, generate, length=TEST_LENGTH, width=WIDTH, height=HEIGHT,
+                 disabled=()):
+        # inputs/outputs: column of each input (top edge) and output (bottom edge)
+        # generate(rng, length): returns (input streams, expected output streams)
+        # disabled: indexes of the nodes that can't be used
+        self.id = id
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.generate = generate
+        self.length = length
+        self.width = width
+        self.height = height
+        self.topology = Topology(width, height, disabled, [(col, UP) for col in self.inputs],
+                                 [((height - 1) * width + col, DOWN) for col in self.outputs])
+        self.neighbors = self.topology.neighbors
+
+    def input_ports(self):
+        return list(self.topology.inputs)
+
+    def output_ports(self):
+        return list(self.topology.outputs)
+
+    def connected_ports(self, node):
+        # ports of a node that lead somewhere: a neighbor, an input or an output
+        return self.topology.connected_ports(node)
+
+    def test_set(self, seed=0):
+        # random is imported here so importing puzzles stays cheap
+        import random
+        inputs, outputs = self.generate(random.Random(seed), self.length)
+        return TestSet(inputs, outputs)
+
+    def engine(self, programs, test_set):
+        programs = [decode(p) if isinstance(p, str) else p for p in programs]
+        programs += [()] * (self.width * self.height - len(programs))
+        return Engine(programs, self.topology,
+                      dict(zip(self.input_ports(), test_set.inputs)), self.output_ports())
+
+    def evaluate(self, programs, test_set, max_cycles=MAX_CYCLES, patience=None):
+        # Run until every output stream is complete, a wrong value is written,
+        # the board gets stuck, or max_cycles is reached. With patience, also
+        # give up when no output is written for that many cycles.
+        return self.run(self.engine(programs, test_set), test_set, max_cycles, patience)
+
+    def run(self, engine, test_set, max_cycles=MAX_CYCLES, patience=None, last=0, hook=None):
+        # evaluate() from the current state of an engine. last is the cycle of
+        # the last output written so far, and hook(engine, last) is called
+        # after every cycle.
+        for result in self.running(engine, test_set, max_cycles, patience, last, hook):
+            pass
+        return result
+
+    def running(self, engine, test_set, max_cycles=MAX_CYCLES, patience=None, last=0, hook=None, every=None):
+        # run() as a generator, so several runs can take turns: it yields
+        # None after every `every` cycles, and the Result at the end
+        streams = [engine.outputs[port] for port in self.output_ports()]
+        expected = test_set.outputs
+        total = test_set.expected()
+        count = engine.output_count()
+        cycles = last
+        # Values of every stream checked so far, and how many of them
+        # matched up to the first wrong one. They are counted as values are
+        # written, so the result needs no second pass over the outputs.
+        checked = [0] * len(streams)
+        matched = [0] * len(streams)
+        wrong = self._check(streams, expected, checked, matched)
+        while engine.cycle < max_cycles and count < total and not wrong:
+            active = engine.step()
+            written = engine.output_count() != count
+            if written:
+                count = engine.output_count()
+                cycles = engine.cycle
+                wrong = self._check(streams, expected, checked, matched)
+            if hook:
+                hook(engine, cycles)
+            if not active:
+                break
+            if not written and patience and engine.cycle - cycles > patience:
+                break
+            if every and engine.cycle % every == 0:
+                yield None
+        correct = sum(matched)
+        passed = correct == total
+        nodes = sum(1 for program in engine.programs if program)
+        instructions = sum(len(program) for program in engine.programs)
+        read = sum(engine.position.values())
+        yield Result(passed, correct, total, cycles, nodes, instructions, read)
+
+    def _check(self, streams, expected, checked, matched):
+        # check the values written since the last call, returns whether any stream went wrong
+        wrong = False
+        for k, values in enumerate(streams):
+            want = expected[k]
+            while checked[k] < len(values):
+                n = checked[k]
+                if matched[k] == n and n < len(want) and values[n] == want[n]:
+                    matched[k] += 1
+                else:
+                    wrong = True
+                checked[k] += 1
+        return wrong
+
+
+def parse_solution(text):
+    # Solutions use the game's save format: every node starts with a line
+    # @<node>, followed by its program. Returns one program text per node.
+    programs = {}
+    node = None
+    for line in text.splitlines():
+        if line.strip().startswith('@'):
+            node = int(line.strip()[1:])
+            programs[node] = []
+        elif node is not None:
+            programs[node].append(line)
+        elif line.strip():
+            raise Exception('program text before the first @<node> line: {}'.format(line))
+    if not programs:
+        return []
+    res = [''] * (max(programs) + 1)
+    for node, lines in programs.items():
+        res[node] = '\n'.join(lines).strip()
+    return res
+
+
+def format_solution(programs):
+    return '\n\n'.join('@{}\n{}'.format(i, p if isinstance(p, str) else encode(p))
+                       for i, p in enumerate(programs)) + '\n'
+
+
+def load_solution(path):
+    with open(path) as f:
+        return parse_solution(f.read())
+
+
+def _streams(rng, length, count, low=10, high=99):
+    return [[rng.randint(low, high) for _ in range(length)] for _ in range(count)]
+
+
+def _self_test(rng, length):
+    x, a = _streams(rng, length, 2)
+    return [x, a], [x, a]
+
+
+def _amplifier(rng, length):
+    a, = _streams(rng, length, 1)
+    return [a], [[2 * v for v in a]]
+
+
+def _differential(rng, length):
+    a, b = _streams(rng, length, 2)
+    return [a, b], [[x - y for x, y in zip(a, b)], [y - x for x, y in zip(a, b)]]
+
+
+def _comparator(rng, length):
+    a, = _streams(rng, length, 1, -2, 2)
+    return [a], [[int(v > 0) for v in a], [int(v == 0) for v in a], [int(v < 0) for v in a]]
+
+
+PUZZLES = dict((puzzle.id, puzzle) for puzzle in [
+    Puzzle('00150', 'SELF-TEST DIAGNOSTIC', [0, 3], [0, 3], _self_test),
+    Puzzle('10981', 'SIGNAL AMPLIFIER', [1], [2], _amplifier),
+    Puzzle('20176', 'DIFFERENTIAL CONVERTER', [1, 2], [1, 2], _differential),
+    Puzzle('21340', 'SIGNAL COMPARATOR', [0], [1, 2, 3], _comparator),
+])
+
+
+def get_puzzle(id):
+    if id not in PUZZLES:
+        raise Exception('unknown puzzle {}'.format(id))
+    return PUZZLES[id]
@@ -0,0 +1,48 @@
+from .assembly import RUN
+from .engine import source_lines
+
+# Text rendering of an engine's state. Nothing here is called while
+# simulating, so fast-forwarding never pays for building strings.
+
+WIDTH = 20
+LINES = 15
+
+
+def render_node(engine, i, source, name=None):
+    # 15 lines of 26 characters, in the same layout as AssemblyChip.__str__
+    lines = [line.strip() for line in source.lower().splitlines()] if source else []
+    current = None
+    if engine.programs[i]:
+        current = source_lines(source)[engine.pc[i]]
+    res = [''.ljust(WIDTH) + '|'] * LINES
+    for idx, line in enumerate(lines[:LINES]):
+        if idx == current:
+            line = '*' + line
+        res[idx] = line[:WIDTH].ljust(WIDTH) + '|'
+
+    def quad(title, value, idx):
+        res[idx] += title.ljust(4) + '|'
+        res[idx + 1] += str(value).ljust(4) + '|'
+        res[idx + 2] += '-' * 5
+
+    quad('ACC', engine.acc[i], 0)
+    quad('BAK', engine.bak[i], 3)
+    quad('LAST', 'n/a', 6)
+    quad('MODE', engine.mode[i], 9)
+    quad('PORT', engine.port[i] if engine.mode[i] != RUN else '', 12)
+    title = name if name is not None else 'node {}'.format(i)
+    return [title.ljust(WIDTH + 6)] + res
+
+
+def render_board(engine, sources, width):
+    # nodes side by side, `width` nodes per row
+    rows = ['cycle {}'.format(engine.cycle)]
+    for start in range(0, len(engine.programs), width):
+        nodes = [render_node(engine, i, sources[i] if i < len(sources) else '')
+                 for i in range(start, min(start + width, len(engine.programs)))]
+        for parts in zip(*nodes):
+            rows.append('  '.join(parts))
+        rows.append('')
+    for (node, port), values in sorted(engine.outputs.items()):
+        rows.append('output node {} {}: {}'.format(node, port, ' '.join(str(v) for v in values)))
+    return '\n'.join(rows)
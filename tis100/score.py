@@ -0,0 +1,187 @@
+import os
+from functools import partial
+
+from .puzzle import get_puzzle, load_solution, MAX_CYCLES
+from .testsets import interleaved
+
+# Scoring solutions the way the game's leaderboards do.
+#
+# A solution is scored on three metrics: cycles (averaged over several test
+# sets), nodes with a program, and instructions. Everything comes from the
+# puzzle.Result of each test set, which counts them while simulating.
+# Cycles run up to the arrival of the last output value, so the values still
+# draining through the board at the end are counted.
+#
+# A Report puts many scores together into percentiles and histograms of
+# every metric, like the ones the game shows after a puzzle is solved, and
+# rank() says where a score falls in them.
+#
+#   python -m tis100.score PATH... [--puzzle ID] [--tests N] [--workers N] [--each]
+# scores every solution file (directories are searched for *.txt files) on
+# a pool of worker processes and prints the report. The puzzle id is taken
+# from the file name, like the game's 10981.0.txt.
+
+TESTS = 3
+WORKERS = 2
+METRICS = ('cycles', 'nodes', 'instructions')
+PERCENTILES = (10, 25, 50, 75, 90)
+BINS = 10
+
+
+class Score:
+    def __init__(self, passed, cycles, nodes, instructions):
+        self.passed = passed
+        self.cycles = cycles
+        self.nodes = nodes
+        self.instructions = instructions
+
+    def __str__(self):
+        return '{}: {:g} cycles, {} nodes, {} instructions'.format(
+            'PASSED' if self.passed else 'FAILED', self.cycles, self.nodes, self.instructions)
+
+
+def score(results):
+    # the Score of a solution from the puzzle.Result of every test set,
+    # a failure when there are none
+    if not results:
+        return Score(False, 0, 0, 0)
+    cycles = sum(result.cycles for result in results) / float(len(results))
+    return Score(all(result.passed for result in results), round(cycles, 1),
+                 results[0].nodes, results[0].instructions)
+
+
+def score_solution(puzzle, programs, tests=TESTS, seed=0, max_cycles=MAX_CYCLES):
+    # stops at the first test set that fails, the Score is a failure either way
+    test_sets = [puzzle.test_set(n) for n in range(seed, seed + tests)]
+    return score(interleaved(puzzle, programs, test_sets, max_cycles).results())
+
+
+def percentile(values, p):
+    # nearest rank percentile of sorted values
+    if not values:
+        return None
+    k = -(-p * len(values) // 100)
+    return values[min(max(int(k), 1), len(values)) - 1]
+
+
+class Histogram:
+    def __init__(self, values, bins=BINS):
+        self.values = sorted(values)
+        self.counts = []
+        # first value of every bin, bins are the same width
+        self.starts = []
+        if not self.values:
+            return
+        low, high = self.values[0], self.values[-1]
+        width = max(1, -(-(high - low + 1) // bins))
+        self.counts = [0] * bins
+        self.starts = [low + k * width for k in range(bins)]
+        for value in self.values:
+            self.counts[min(int((value - low) // width), bins - 1)] += 1
+        # drop empty bins at the end
+        while self.counts and not self.counts[-1]:
+            self.counts.pop()
+            self.starts.pop()
+
+    def percentiles(self, ps=PERCENTILES):
+        return [(p, percentile(self.values, p)) for p in ps]
+
+    def rank(self, value):
+        # percentage of the values that value is at least as good as (smaller is better)
+        if not self.values:
+            return None
+        return 100.0 * sum(1 for v in self.values if v >= value) / len(self.values)
+
+    def render(self, width=40):
+        most = max(self.counts) if self.counts else 0
+        res = []
+        for start, count in zip(self.starts, self.counts):
+            bar = '#' * int(round(width * count / float(most))) if most else ''
+            res.append('  {:>8g} {} {}'.format(start, bar, count))
+        return res
+
+
+class Report:
+    def __init__(self, scores, bins=BINS):
+        # only solutions that passed make it into the histograms
+        self.scores = list(scores)
+        self.passed = [s for s in self.scores if s.passed]
+        self.histograms = dict((metric, Histogram([getattr(s, metric) for s in self.passed], bins))
+                               for metric in METRICS)
+
+    def rank(self, score):
+        # {metric: percentage of the passing solutions that score is at least as good as}
+        return dict((metric, self.histograms[metric].rank(getattr(score, metric))) for metric in METRICS)
+
+    def __str__(self):
+        res = ['{} solutions, {} passed'.format(len(self.scores), len(self.passed))]
+        for metric in METRICS:
+            histogram = self.histograms[metric]
+            if not histogram.values:
+                continue
+            percentiles = ', '.join('p{} {:g}'.format(p, v) for p, v in histogram.percentiles())
+            res.append('{}: {}'.format(metric, percentiles))
+            res.extend(histogram.render())
+        return '\n'.join(res)
+
+
+def solution_paths(paths):
+    # solution files, with directories searched for *.txt files
+    res = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in sorted(os.walk(path)):
+                res.extend(os.path.join(root, name) for name in sorted(names) if name.endswith('.txt'))
+        else:
+            res.append(path)
+    return res
+
+
+def score_file(path, puzzle=None, **kwargs):
+    # (path, Score, None), or (path, None, error) when the file can't be scored
+    try:
+        if puzzle is None:
+            puzzle = os.path.basename(path).split('.')[0]
+        return (path, score_solution(get_puzzle(puzzle), load_solution(path), **kwargs), None)
+    except Exception as e:
+        return (path, None, str(e))
+
+
+def score_files(paths, workers=WORKERS, executor=None, **kwargs):
+    # score_file() of every path, on a pool of worker processes, in the order of paths
+    # (imported here, so the command line can use score() without loading multiprocessing)
+    from concurrent.futures import ProcessPoolExecutor
+    work = partial(score_file, **kwargs)
+    chunksize = max(1, len(paths) // (4 * max(1, workers)))
+    if executor is not None:
+        return list(executor.map(work, paths, chunksize=chunksize))
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(work, paths, chunksize=chunksize))
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='score solutions and report histograms of their metrics')
+    parser.add_argument('paths', nargs='+', help='solution files or directories of them')
+    parser.add_argument('--puzzle', help='puzzle id (default: from the file names)')
+    parser.add_argument('--tests', type=int, default=TESTS, help='test sets to average the cycles over')
+    parser.add_argument('--seed', type=int, default=0, help='first test set')
+    parser.add_argument('--max-cycles', type=int, default=MAX_CYCLES)
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes')
+    parser.add_argument('--each', action='store_true', help='also print the score of every solution')
+    args = parser.parse_args(argv)
+    if args.tests < 1:
+        parser.error('--tests must be at least 1')
+    scored = score_files(solution_paths(args.paths), args.workers, puzzle=args.puzzle, tests=args.tests,
+                         seed=args.seed, max_cycles=args.max_cycles)
+    for path, result, error in scored:
+        if error is not None:
+            print('{}: {}'.format(path, error))
+        elif args.each:
+            print('{}: {}'.format(path, result))
+    print(Report(result for _, result, _ in scored if result is not None))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
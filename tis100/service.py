@@ -0,0 +1,276 @@
+import asyncio
+import itertools
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from .logger import info
+from .puzzle import get_puzzle, parse_solution, MAX_CYCLES
+
+# Evaluation service.
+#
+# A local asyncio server that evaluates boards for any number of clients
+# (GA workers, for example). It speaks JSON lines, over a Unix socket or
+# over stdin/stdout:
+#
+#   python -m tis100.service --socket /tmp/tis100.sock [--workers N] [--queue N]
+#   python -m tis100.service --stdio
+#
+# Requests, one JSON object per line:
+#   {"id": 1, "puzzle": "10981", "programs": ["", "mov up, down", ...],
+#    "tests": 3, "seed": 0, "max_cycles": 10000}
+#       "solution" (text in the game's save format) can be given instead of
+#       "programs". Everything but the puzzle and the board is optional.
+#   {"id": 2, "op": "stats"}
+# Every request gets exactly one response, sent once all of its test sets
+# have been evaluated (results are not streamed test set by test set).
+# Responses come back as soon as they are ready, so not always in the
+# order of the requests; the id tells them apart:
+#   {"id": 1, "results": [{"passed": true, "correct": 39, ...}, ...]}
+#       one puzzle.Result per test set, in the order of the test sets
+#   {"id": 1, "error": "unknown puzzle 12345"}
+#
+# Boards are evaluated on a pool of worker processes, by the fast engine
+# (which steps exactly like AssemblyChip, but without parsing every cycle).
+# Jobs wait in a bounded queue. When it is full, the server stops reading
+# from the connection that is submitting, so that client blocks as soon as
+# the socket buffers fill up. Identical requests that come in while the
+# first one is still queued or running share its result.
+
+WORKERS = 2
+QUEUE_SIZE = 64
+
+
+def evaluate(puzzle_id, programs, tests, seed, max_cycles):
+    # runs in a worker process, returns one puzzle.Result (as a dict) per test set
+    puzzle = get_puzzle(puzzle_id)
+    return [vars(puzzle.evaluate(list(programs), puzzle.test_set(n), max_cycles))
+            for n in range(seed, seed + tests)]
+
+
+def job(request):
+    # the arguments of evaluate() for a request, which also identify it
+    puzzle = request['puzzle']
+    get_puzzle(puzzle)
+    if 'programs' in request:
+        programs = request['programs']
+    elif 'solution' in request:
+        programs = parse_solution(request['solution'])
+    else:
+        raise Exception('request needs programs or a solution')
+    return (puzzle, tuple(program.strip() for program in programs),
+            int(request.get('tests', 1)), int(request.get('seed', 0)), int(request.get('max_cycles', MAX_CYCLES)))
+
+
+class Service:
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE, executor=None):
+        # executor: any concurrent.futures executor, by default a pool of worker processes
+        self.workers = workers
+        self.executor = executor
+        self.owned = executor is None
+        self.queue = asyncio.Queue(queue_size)
+        # job -> future of its results, while it is queued or running
+        self.inflight = {}
+        self.tasks = []
+        self.submitted = 0
+        self.evaluated = 0
+        self.deduplicated = 0
+
+    def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers)
+        self.tasks = [asyncio.ensure_future(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.owned and self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def submit(self, request):
+        # Queue a request, waiting while the queue is full. Returns a future
+        # of its results.
+        key = job(request)
+        self.submitted += 1
+        if key in self.inflight:
+            self.deduplicated += 1
+            return self.inflight[key]
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            await self.queue.put(key)
+        except BaseException:
+            del self.inflight[key]
+            future.cancel()
+            raise
+        return future
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            key = await self.queue.get()
+            future = self.inflight[key]
+            try:
+                results = await loop.run_in_executor(self.executor, evaluate, *key)
+                self.evaluated += 1
+                if not future.done():
+                    future.set_result(results)
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                del self.inflight[key]
+                self.queue.task_done()
+
+    def stats(self):
+        return {'submitted': self.submitted, 'evaluated': self.evaluated, 'deduplicated': self.deduplicated,
+                'queued': self.queue.qsize(), 'inflight': len(self.inflight)}
+
+    async def handle(self, reader, writer):
+        # serve one connection until the client closes it
+        lock = asyncio.Lock()
+        pending = set()
+
+        async def reply(message):
+            async with lock:
+                writer.write((json.dumps(message) + '\n').encode())
+                await writer.drain()
+
+        async def answer(id, future):
+            # the one response to a request, once all of its test sets are done
+            try:
+                message = {'id': id, 'results': await future}
+            except Exception as e:
+                message = {'id': id, 'error': str(e)}
+            await reply(message)
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if not line.strip():
+                continue
+            id = None
+            try:
+                request = json.loads(line.decode())
+                id = request.get('id')
+                if request.get('op') == 'stats':
+                    await reply({'id': id, 'stats': self.stats()})
+                    continue
+                # blocks while the queue is full, so nothing more is read
+                future = await self.submit(request)
+            except Exception as e:
+                await reply({'id': id, 'error': str(e)})
+                continue
+            task = asyncio.ensure_future(answer(id, future))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+        writer.close()
+
+
+async def serve_unix(service, path):
+    # serve until cancelled
+    server = await asyncio.start_unix_server(service.handle, path)
+    info('listening on {}'.format(path))
+    async with server:
+        await server.serve_forever()
+
+
+async def serve_stdio(service):
+    # serve requests from stdin until it is closed
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    transport, protocol = await loop.connect_write_pipe(asyncio.streams.FlowControlMixin, sys.stdout)
+    writer = asyncio.StreamWriter(transport, protocol, reader, loop)
+    await service.handle(reader, writer)
+
+
+class Client:
+    # Talks to a service. Any number of requests can be waiting at once.
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.ids = itertools.count(1)
+        # id -> future of the response
+        self.waiting = {}
+        self.listener = asyncio.ensure_future(self._listen())
+
+    @classmethod
+    async def connect(cls, path):
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    async def _listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line.decode())
+            future = self.waiting.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.waiting.values():
+            future.set_exception(Exception('connection closed'))
+        self.waiting = {}
+
+    async def request(self, request):
+        id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.waiting[id] = future
+        self.writer.write((json.dumps(dict(request, id=id)) + '\n').encode())
+        await self.writer.drain()
+        response = await future
+        if 'error' in response:
+            raise Exception(response['error'])
+        return response
+
+    async def evaluate(self, puzzle, programs, tests=1, seed=0, max_cycles=MAX_CYCLES):
+        # a dict of puzzle.Result fields for every test set
+        response = await self.request({'puzzle': puzzle, 'programs': list(programs), 'tests': tests,
+                                       'seed': seed, 'max_cycles': max_cycles})
+        return response['results']
+
+    async def evaluate_all(self, puzzle, boards, **kwargs):
+        return await asyncio.gather(*[self.evaluate(puzzle, programs, **kwargs) for programs in boards])
+
+    async def stats(self):
+        return (await self.request({'op': 'stats'}))['stats']
+
+    async def close(self):
+        self.writer.close()
+        await self.listener
+
+
+async def main(args):
+    service = Service(args.workers, args.queue)
+    service.start()
+    try:
+        if args.stdio:
+            await serve_stdio(service)
+        else:
+            await serve_unix(service, args.socket)
+    finally:
+        await service.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='serve board evaluations as JSON lines')
+    where = parser.add_mutually_exclusive_group(required=True)
+    where.add_argument('--socket', help='Unix socket to listen on')
+    where.add_argument('--stdio', action='store_true', help='read requests from stdin, write results to stdout')
+    parser.add_argument('--workers', type=int, default=WORKERS, help='worker processes')
+    parser.add_argument('--queue', type=int, default=QUEUE_SIZE, help='jobs that can wait before clients block')
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,307 @@
+import math
+import random
+
+from .assembly import MOV, ADD, SUB
+from .engine import Engine, decode, encode, PORTS, JUMPS, MAX_INSTRUCTIONS
+from .grammar import Grammar, useless
+
+# Superoptimizer for the program of a single node.
+#
+# The node is run on its own, with every port it reads fed from a random
+# input stream (a test vector) and every port it writes collected. A candidate
+# program is equivalent when it writes exactly the same values to the same
+# ports on every test vector. Candidates come from three searches:
+#   enumerate  - every program up to a (small) number of instructions
+#   peephole   - every replacement of a short window of the original program,
+#                which scales to programs up to the 15 instruction limit
+#   stochastic - random mutations of the original, accepted or rejected like
+#                simulated annealing
+# Candidates are pruned before they are run: useless instructions are never
+# generated, programs with more useless instructions (see grammar.useless)
+# than the original are skipped, and so are programs that don't write to
+# every output port. Simulation stops at the first wrong output value.
+# Useless code the original already has doesn't count against a candidate,
+# or no window of a program with a NOP somewhere else could ever be replaced.
+
+VECTORS = 8
+VECTOR_LENGTH = 16
+
+
+def used_ports(program):
+    # (ports read, ports written) by a decoded program
+    reads = []
+    writes = []
+    for op, a, b in program:
+        if op in (MOV, ADD, SUB) and a in PORTS and a not in reads:
+            reads.append(a)
+        if op == MOV and b in PORTS and b not in writes:
+            writes.append(b)
+    return tuple(reads), tuple(writes)
+
+
+def constants(program):
+    res = set([1, -1])
+    for op, a, b in program:
+        if op in (MOV, ADD, SUB) and isinstance(a, int):
+            res.add(a)
+    res.discard(0)
+    return res
+
+
+def make_vectors(reads, rng, count=VECTORS, length=VECTOR_LENGTH, low=-99, high=99):
+    # random input streams for each port read. The first vector also
+    # contains the extreme values, so saturation at +/-999 gets checked.
+    vectors = []
+    for n in range(count):
+        vector = {}
+        for port in reads:
+            values = [rng.randint(low, high) for _ in range(length)]
+            if n == 0 and length >= 4:
+                values[:4] = [999, -999, 0, 999]
+            vector[port] = values
+        vectors.append(vector)
+    return vectors
+
+
+class Run:
+    def __init__(self, outputs, cycles, ok):
+        # values written to each port, cycle of the last write, and whether
+        # the run matched what was expected of it
+        self.outputs = outputs
+        self.cycles = cycles
+        self.ok = ok
+
+
+def run_node(program, vector, writes, expected=None, limit=VECTOR_LENGTH, max_cycles=1000):
+    # Run a single node on one test vector. Without expected outputs the node
+    # runs until it has written limit values, it gets stuck, or max_cycles is
+    # reached. With expected outputs it stops at the first wrong value.
+    engine = Engine([program], inputs=dict(((0, port), values) for port, values in vector.items()),
+                    outputs=[(0, port) for port in writes])
+    # the engine collects outputs by (node, port), this node is node 0
+    outputs = dict((port, engine.outputs[(0, port)]) for port in writes)
+    if expected is not None:
+        limit = sum(len(values) for values in expected.values())
+    count = 0
+    last = 0
+    state = engine.node_state(0)
+    while count < limit and engine.cycle < max_cycles:
+        engine.step()
+        new_state = engine.node_state(0)
+        if new_state == state:
+            # nothing changed, so nothing ever will
+            break
+        state = new_state
+        total = engine.output_count()
+        if total != count:
+            count = total
+            last = engine.cycle
+            if expected is not None:
+                for port, values in outputs.items():
+                    if values and (len(values) > len(expected[port]) or values[-1] != expected[port][len(values) - 1]):
+                        return Run(outputs, last, False)
+    ok = expected is None or all(outputs[port] == values for port, values in expected.items())
+    return Run(outputs, last, ok)
+
+
+class Improvement:
+    def __init__(self, program, cycles, strategy):
+        self.program = program
+        self.cycles = cycles
+        self.instructions = len(program)
+        self.strategy = strategy
+
+    def __str__(self):
+        return '{} cycles, {} instructions ({})\n{}'.format(
+            self.cycles, self.instructions, self.strategy, encode(self.program))
+
+
+class Superoptimizer:
+    def __init__(self, program, reads=None, writes=None, vectors=VECTORS, length=VECTOR_LENGTH, seed=0):
+        if isinstance(program, str):
+            program = decode(program)
+        self.program = program
+        used_reads, used_writes = used_ports(program)
+        self.reads = tuple(reads) if reads is not None else used_reads
+        self.writes = tuple(writes) if writes is not None else used_writes
+        if not self.writes:
+            raise Exception('program never writes to a port, nothing to compare')
+        self.rng = random.Random(seed)
+        self.grammar = Grammar(self.reads, self.writes, constants(program))
+        self.vectors = make_vectors(self.reads, self.rng, vectors, length)
+        self.expected = []
+        self.budgets = []
+        self.cycles = 0
+        for vector in self.vectors:
+            run = run_node(program, vector, self.writes, limit=length, max_cycles=length * 100)
+            if not run.cycles:
+                raise Exception('program never writes anything on test vectors')
+            self.expected.append(dict((port, values[:]) for port, values in run.outputs.items()))
+            # candidates may be somewhat slower, as long as they are shorter
+            self.budgets.append(run.cycles * 2 + 10)
+            self.cycles += run.cycles
+        self.instructions = len(program)
+        self.useless = useless(program)
+        self.tried = 0
+        self.best = {}
+
+    def check(self, program):
+        # total cycles over all test vectors, or None when not equivalent.
+        # Vectors are tried in order, so most candidates fail on the first one.
+        self.tried += 1
+        total = 0
+        for vector, expected, budget in zip(self.vectors, self.expected, self.budgets):
+            run = run_node(program, vector, self.writes, expected, max_cycles=budget)
+            if not run.ok:
+                return None
+            total += run.cycles
+        return total
+
+    def writes_all(self, program):
+        return set(self.writes) <= set(b for op, a, b in program if op == MOV)
+
+    def is_useful(self, program):
+        # no more useless instructions than the original
+        return useless(program) <= self.useless
+
+    def consider(self, program, strategy):
+        if not program or not self.writes_all(program) or not self.is_useful(program):
+            return None
+        cycles = self.check(program)
+        if cycles is None:
+            return None
+        if cycles < self.cycles or len(program) < self.instructions:
+            key = (cycles, len(program))
+            if key not in self.best:
+                self.best[key] = Improvement(program, cycles, strategy)
+        return cycles
+
+    def enumerate(self, max_length=2, limit=None):
+        # depth first over all programs of up to max_length instructions
+        def extend(prefix, length):
+            if limit is not None and self.tried >= limit:
+                return
+            if len(prefix) == length:
+                self.consider(tuple(prefix), 'enumerate')
+                return
+            for instruction in self.grammar.instructions(length):
+                prefix.append(instruction)
+                extend(prefix, length)
+                prefix.pop()
+
+        for length in range(1, min(max_length, MAX_INSTRUCTIONS) + 1):
+            extend([], length)
+        return self.improvements()
+
+    def peephole(self, window=2, size=2, limit=None):
+        # replace every window of up to `window` instructions of the original
+        # with every sequence of up to `size` instructions (including nothing)
+        program = self.program
+        for start in range(len(program)):
+            for width in range(1, min(window, len(program) - start) + 1):
+                for k in range(0, size + 1):
+                    length = len(program) - width + k
+                    if length < 1 or length > MAX_INSTRUCTIONS:
+                        continue
+                    for seq in self._sequences(k, length):
+                        if limit is not None and self.tried >= limit:
+                            return self.improvements()
+                        candidate = splice(program, start, width, seq)
+                        if candidate != program:
+                            self.consider(candidate, 'peephole')
+        return self.improvements()
+
+    def _sequences(self, k, length):
+        if k == 0:
+            yield ()
+            return
+        for instruction in self.grammar.instructions(length):
+            for rest in self._sequences(k - 1, length):
+                yield (instruction,) + rest
+
+    def stochastic(self, iterations=2000, temperature=1.0):
+        # Metropolis search from the original program. The cost of a
+        # candidate is dominated by how wrong it is, then by cycles and size.
+        current = self.program
+        current_cost = self._cost(current)
+        for _ in range(iterations):
+            candidate = self.grammar.mutate(current, self.rng)
+            if not candidate:
+                continue
+            cost = self._cost(candidate)
+            if cost <= current_cost or self.rng.random() < math.exp((current_cost - cost) / temperature):
+                current, current_cost = candidate, cost
+                if self.writes_all(current) and self.is_useful(current):
+                    self.consider(current, 'stochastic')
+        return self.improvements()
+
+    def _cost(self, program):
+        wrong = 0
+        cycles = 0
+        for vector, expected, budget in zip(self.vectors, self.expected, self.budgets):
+            run = run_node(program, vector, self.writes, expected, max_cycles=budget)
+            for port, values in expected.items():
+                got = run.outputs.get(port, [])
+                same = 0
+                while same < min(len(got), len(values)) and got[same] == values[same]:
+                    same += 1
+                wrong += len(values) - same
+            cycles += run.cycles if run.ok else budget
+        return wrong * 10 + cycles / float(self.cycles) + len(program) / float(MAX_INSTRUCTIONS)
+
+    def improvements(self):
+        # improvements that no other improvement beats on both cycles and
+        # instructions, fastest first
+        res = []
+        for key in sorted(self.best):
+            if not res or key[1] < res[-1].instructions:
+                res.append(self.best[key])
+        return res
+
+    def search(self, max_length=2, window=2, iterations=2000):
+        self.enumerate(max_length)
+        self.peephole(window)
+        self.stochastic(iterations)
+        return self.improvements()
+
+    def report(self):
+        res = ['original: {} cycles, {} instructions, {} candidates tried'.format(
+            self.cycles, self.instructions, self.tried)]
+        for improvement in self.improvements():
+            res.append('')
+            res.append(str(improvement))
+        return '\n'.join(res)
+
+
+def splice(program, start, width, seq):
+    # replace program[start:start + width] with seq, keeping jumps pointing
+    # at the same instructions. Jumps into the replaced window go to its start.
+    k = len(seq)
+    length = len(program) - width + k
+    res = []
+    for idx, (op, a, b) in enumerate(program[:start] + tuple(seq) + program[start + width:]):
+        if op in JUMPS and not start <= idx < start + k:
+            if a >= start + width:
+                a = a - width + k
+            elif a >= start:
+                a = start
+            a %= length
+        res.append((op, a, b))
+    return tuple(res)
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='search for faster or shorter versions of a node program')
+    parser.add_argument('program', help='file holding the program of one node')
+    parser.add_argument('--reads', nargs='*', choices=PORTS, help='ports read (default: from the program)')
+    parser.add_argument('--writes', nargs='*', choices=PORTS, help='ports written (default: from the program)')
+    parser.add_argument('--length', type=int, default=2, help='enumerate programs up to this length')
+    parser.add_argument('--window', type=int, default=2, help='peephole window size')
+    parser.add_argument('--iterations', type=int, default=2000, help='stochastic search iterations')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    with open(args.program) as f:
+        optimizer = Superoptimizer(f.read(), args.reads, args.writes, seed=args.seed)
+    optimizer.search(args.length, args.window, args.iterations)
+    print(optimizer.report())
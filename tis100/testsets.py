@@ -0,0 +1,121 @@
+import time
+
+from .engine import decode
+from .puzzle import MAX_CYCLES
+
+# Evaluating one solution on several test sets.
+#
+# The programs are decoded once, and every test set gets an engine built
+# from the same decoded programs. The test sets run either
+#   interleaved()   in this process, taking turns every `every` cycles, or
+#   pooled()        on a pool of workers, one test set per task.
+# Both stop as soon as a test set fails (unless stop_early is False). In
+# interleaved(), the other runs are stopped where they are. In pooled(),
+# test sets that haven't started are cancelled, and results of the ones
+# already running are ignored.
+#
+# Either way the result is an Evaluation, with the puzzle.Result, cycles
+# simulated and time taken of every test set that finished.
+
+EVERY = 100
+
+
+class TestSetRun:
+    def __init__(self, index, result=None, simulated=0, elapsed=0.0):
+        # index of the test set, and its puzzle.Result, or None when it was stopped or never run
+        self.index = index
+        self.result = result
+        # cycles simulated, and seconds spent simulating them
+        self.simulated = simulated
+        self.elapsed = elapsed
+
+    def __str__(self):
+        if self.result is None:
+            return 'test set {}: stopped after {} cycles'.format(self.index, self.simulated)
+        return 'test set {}: {} ({:.3f}s)'.format(self.index, self.result, self.elapsed)
+
+
+class Evaluation:
+    def __init__(self, runs, elapsed):
+        # one TestSetRun per test set, in the order of the test sets
+        self.runs = runs
+        self.elapsed = elapsed
+
+    def results(self):
+        # the puzzle.Result of every test set that finished
+        return [run.result for run in self.runs if run.result is not None]
+
+    def passed(self):
+        return all(run.result is not None and run.result.passed for run in self.runs)
+
+    def failed(self):
+        # index of the first test set that failed, None when none did
+        for run in self.runs:
+            if run.result is not None and not run.result.passed:
+                return run.index
+        return None
+
+
+def decode_all(programs):
+    return [decode(p) if isinstance(p, str) else p for p in programs]
+
+
+def interleaved(puzzle, programs, test_sets, max_cycles=MAX_CYCLES, patience=None, stop_early=True, every=EVERY):
+    start = time.perf_counter()
+    programs = decode_all(programs)
+    runs = [TestSetRun(k) for k in range(len(test_sets))]
+    engines = [puzzle.engine(programs, test_set) for test_set in test_sets]
+    running = dict((k, puzzle.running(engines[k], test_set, max_cycles, patience, every=every))
+                   for k, test_set in enumerate(test_sets))
+    while running:
+        for k in list(running):
+            before = time.perf_counter()
+            result = next(running[k])
+            runs[k].elapsed += time.perf_counter() - before
+            runs[k].simulated = engines[k].cycle
+            if result is None:
+                continue
+            runs[k].result = result
+            del running[k]
+            if stop_early and not result.passed:
+                running = {}
+                break
+    return Evaluation(runs, time.perf_counter() - start)
+
+
+def run_test_set(puzzle, programs, test_set, index, max_cycles, patience):
+    # one task of pooled(), returns its TestSetRun
+    start = time.perf_counter()
+    engine = puzzle.engine(programs, test_set)
+    result = puzzle.run(engine, test_set, max_cycles, patience)
+    return TestSetRun(index, result, engine.cycle, time.perf_counter() - start)
+
+
+def pooled(puzzle, programs, test_sets, workers=2, executor=None, max_cycles=MAX_CYCLES, patience=None,
+           stop_early=True):
+    # executor: any concurrent.futures executor, by default a pool of worker processes
+    from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+    start = time.perf_counter()
+    programs = decode_all(programs)
+    owned = executor is None
+    if owned:
+        executor = ProcessPoolExecutor(min(workers, len(test_sets)) or 1)
+    runs = [TestSetRun(k) for k in range(len(test_sets))]
+    try:
+        pending = set(executor.submit(run_test_set, puzzle, programs, test_set, k, max_cycles, patience)
+                      for k, test_set in enumerate(test_sets))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            failed = False
+            for future in done:
+                run = future.result()
+                runs[run.index] = run
+                failed = failed or not run.result.passed
+            if stop_early and failed:
+                for future in pending:
+                    future.cancel()
+                break
+    finally:
+        if owned:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return Evaluation(runs, time.perf_counter() - start)
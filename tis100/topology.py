@@ -0,0 +1,100 @@
+from .assembly import UP, RIGHT, DOWN, LEFT
+
+# Topology of a board: the size of its grid, the nodes that are disabled
+# (broken, as some puzzles of the game have) and the ports where inputs come
+# in and outputs leave.
+#
+# Nodes are numbered row by row, starting at the top left. The neighbors of
+# every node are precomputed into one flat list of ints, `table`, where
+# table[4 * node + SLOT[direction]] is the neighbor in that direction, or
+# NONE at the edge of the grid and next to a disabled node. A disabled node
+# has no neighbors at all, so nothing can be read from or written to it.
+# Building a topology takes time linear in the number of nodes, and every
+# engine looks neighbors up in its table.
+
+DIRECTIONS = (UP, RIGHT, DOWN, LEFT)
+# position of each direction in a node's row of the table
+SLOT = dict((direction, k) for k, direction in enumerate(DIRECTIONS))
+FACING = {UP: DOWN, RIGHT: LEFT, DOWN: UP, LEFT: RIGHT}
+NONE = -1
+
+
+def neighbor_table(neighbors):
+    # the flat table of a list of {direction: node} dicts, one per node
+    table = [NONE] * (4 * len(neighbors))
+    for i, links in enumerate(neighbors):
+        for direction, j in links.items():
+            table[4 * i + SLOT[direction]] = j
+    return table
+
+
+def neighbor_dicts(table):
+    # the inverse of neighbor_table()
+    return [dict((direction, table[i + k]) for k, direction in enumerate(DIRECTIONS) if table[i + k] != NONE)
+            for i in range(0, len(table), 4)]
+
+
+class Topology:
+    def __init__(self, width, height, disabled=(), inputs=(), outputs=()):
+        # disabled: indexes of the disabled nodes
+        # inputs, outputs: (node, direction) ports on the edge of the grid
+        self.width = width
+        self.height = height
+        self.disabled = frozenset(disabled)
+        for node in self.disabled:
+            if not 0 <= node < width * height:
+                raise Exception('no node {} on a {}x{} grid'.format(node, width, height))
+        table = [NONE] * (4 * width * height)
+        for i in range(width * height):
+            if i in self.disabled:
+                continue
+            row, col = divmod(i, width)
+            for direction, j, inside in ((UP, i - width, row > 0), (RIGHT, i + 1, col < width - 1),
+                                         (DOWN, i + width, row < height - 1), (LEFT, i - 1, col > 0)):
+                if inside and j not in self.disabled:
+                    table[4 * i + SLOT[direction]] = j
+        self.table = table
+        self.neighbors = neighbor_dicts(table)
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        for node, direction in self.inputs + self.outputs:
+            if not self.on_edge(node, direction):
+                raise Exception('{} of node {} is not on the edge of the grid'.format(direction, node))
+            if node in self.disabled:
+                raise Exception('node {} is disabled, so it has no inputs or outputs'.format(node))
+
+    def __len__(self):
+        return self.width * self.height
+
+    def neighbor(self, node, direction):
+        # index of the neighbor, or NONE
+        return self.table[4 * node + SLOT[direction]]
+
+    def on_edge(self, node, direction):
+        # whether the port leads out of the grid
+        row, col = divmod(node, self.width)
+        return ((direction == UP and row == 0) or (direction == DOWN and row == self.height - 1) or
+                (direction == LEFT and col == 0) or (direction == RIGHT and col == self.width - 1))
+
+    def enabled(self):
+        return [i for i in range(len(self)) if i not in self.disabled]
+
+    def connected_ports(self, node):
+        # ports of a node that lead somewhere: a neighbor, an input or an output
+        ports = set(self.neighbors[node])
+        ports.update(port for i, port in self.inputs + self.outputs if i == node)
+        return [port for port in DIRECTIONS if port in ports]
+
+    def check(self, programs):
+        # disabled nodes can't be programmed
+        for i in self.disabled:
+            if i < len(programs) and programs[i]:
+                raise Exception('node {} is disabled, but has a program'.format(i))
+
+    def connect(self, chips):
+        # connect AssemblyChips, one per node, like the table says
+        for i, chip in enumerate(chips):
+            for direction in DIRECTIONS:
+                j = self.table[4 * i + SLOT[direction]]
+                if j != NONE:
+                    chip.connect(direction, chips[j])